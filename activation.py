@@ -0,0 +1,109 @@
+import bisect
+
+# Enemies wake up this far past the edges of the screen, in pixels
+ACTIVATION_MARGIN = 160
+
+# And go back to sleep once they are this far past, so one walking along
+# the edge doesn't flip between the two every tick
+DEACTIVATION_MARGIN = 2 * ACTIVATION_MARGIN
+
+
+class ActivationRegion:
+    """
+    Only the enemies and mushrooms near the camera are updated, animated
+    and moved by physics.
+
+    Everything else is dormant. A dormant sprite's velocity is put aside
+    here (not on the sprite, see entity_store.py), so nothing that looks at
+    its velocity moves it. Because dormant sprites don't move they stay
+    sorted by x, so the ones the camera scrolls up to are found with a
+    bisect instead of by checking every sprite in the level.
+    """
+
+    def __init__(self, sprite_lists, view_width, margin=ACTIVATION_MARGIN, deactivation_margin=DEACTIVATION_MARGIN):
+        self.view_width = view_width
+        self.margin = margin
+        self.deactivation_margin = deactivation_margin
+
+        # Sprites that are running, in the order they woke up
+        self.active = []
+
+        # Sleeping sprites sorted by x, with their x positions alongside for bisect
+        self.dormant = []
+        self.dormant_x = []
+        self.dormant_set = set()
+
+        # Sleeping sprite -> (change_x, change_y) it had when it fell asleep
+        self.dormant_velocity = {}
+
+        for sprite_list in sprite_lists:
+            for sprite in sprite_list:
+                self.freeze(sprite)
+
+        # Counters for monitoring
+        self.woken_count = 0
+        self.frozen_count = 0
+
+    def freeze(self, sprite):
+        self.dormant_velocity[sprite] = (sprite.change_x, sprite.change_y)
+        sprite.change_x = 0
+        sprite.change_y = 0
+
+        index = bisect.bisect_right(self.dormant_x, sprite.center_x)
+        self.dormant.insert(index, sprite)
+        self.dormant_x.insert(index, sprite.center_x)
+        self.dormant_set.add(sprite)
+
+    def wake(self, sprite):
+        sprite.change_x, sprite.change_y = self.dormant_velocity.pop(sprite)
+        self.active.append(sprite)
+
+    def add(self, sprite):
+        """A sprite made during play, such as a koopa shell, starts out awake"""
+        self.active.append(sprite)
+
+    def is_dormant(self, sprite):
+        return sprite in self.dormant_set
+
+    def update(self, screen_left):
+        """Wake the sprites the camera is getting close to, and put the ones it left behind to sleep"""
+        left = screen_left - self.margin
+        right = screen_left + self.view_width + self.margin
+
+        start = bisect.bisect_left(self.dormant_x, left)
+        end = bisect.bisect_right(self.dormant_x, right)
+        if start < end:
+            woken = self.dormant[start:end]
+            del self.dormant[start:end]
+            del self.dormant_x[start:end]
+            for sprite in woken:
+                self.dormant_set.discard(sprite)
+                # Removed from the level while asleep (a shell can reach
+                # one just past the margin), let it go
+                if sprite.sprite_lists:
+                    self.wake(sprite)
+                    self.woken_count += 1
+                else:
+                    del self.dormant_velocity[sprite]
+
+        sleep_left = screen_left - self.deactivation_margin
+        sleep_right = screen_left + self.view_width + self.deactivation_margin
+        still_active = []
+        for sprite in self.active:
+            if not sprite.sprite_lists:
+                # Stomped or collected, nothing left to update
+                continue
+            if sprite.center_x < sleep_left or sprite.center_x > sleep_right:
+                self.freeze(sprite)
+                self.frozen_count += 1
+            else:
+                still_active.append(sprite)
+        self.active = still_active
+
+    @property
+    def active_count(self):
+        return len(self.active)
+
+    @property
+    def dormant_count(self):
+        return len(self.dormant)
@@ -0,0 +1,94 @@
+import bisect
+
+# Sprites this far past the edges of the screen are kept on the current
+# frame, so nothing visibly changes frame the moment it scrolls in
+VISIBLE_MARGIN = 40
+
+
+class LayerAnimator:
+    """
+    Plays one looping animation for every sprite in some layers, such as
+    all the coins spinning together.
+
+    There is a single clock for the whole layer instead of a counter in
+    every sprite. Most ticks the frame doesn't change and there is nothing
+    to do. When it does change, only the sprites on screen are given the new
+    texture. The sprites are sorted by x once (coins and boxes don't move
+    sideways), so the ones on screen are a bisect away, and a sprite that
+    scrolls into view is put on the current frame as it comes in.
+
+    The sprites' class gives the animation as FRAME_TICKS, how many ticks
+    each frame shows for, and every sprite has its frames in
+    animation_textures. A sprite showing any other texture, such as a used
+    mystery box, is left alone.
+    """
+
+    def __init__(self, sprite_lists, view_width, margin=VISIBLE_MARGIN):
+        self.view_width = view_width
+        self.margin = margin
+
+        self.sprites = sorted((sprite for sprite_list in sprite_lists for sprite in sprite_list),
+                              key=lambda sprite: sprite.center_x)
+        self.sprites_x = [sprite.center_x for sprite in self.sprites]
+
+        if self.sprites:
+            first = self.sprites[0]
+            self.textures = first.animation_textures
+            frame_ticks = first.FRAME_TICKS
+        else:
+            self.textures = []
+            frame_ticks = [1]
+
+        # Tick within the loop that each frame starts on
+        self.frame_starts = []
+        start = 0
+        for ticks in frame_ticks:
+            self.frame_starts.append(start)
+            start += ticks
+        self.period = start
+
+        self.tick = 0
+        self.frame = 0
+
+        # Range of self.sprites that was on screen last tick
+        self.visible_start = 0
+        self.visible_end = 0
+
+        # Textures actually swapped, for monitoring
+        self.texture_changes = 0
+
+    @property
+    def visible_count(self):
+        return self.visible_end - self.visible_start
+
+    def set_frame(self, start, end):
+        texture = self.textures[self.frame]
+        for index in range(start, end):
+            sprite = self.sprites[index]
+            if sprite.texture is texture or not sprite.sprite_lists:
+                continue
+            if sprite.texture in self.textures:
+                sprite.texture = texture
+                self.texture_changes += 1
+
+    def update(self, screen_left):
+        if not self.sprites:
+            return
+
+        phase = self.tick % self.period
+        self.tick += 1
+        frame = bisect.bisect_right(self.frame_starts, phase) - 1
+
+        start = bisect.bisect_left(self.sprites_x, screen_left - self.margin)
+        end = bisect.bisect_right(self.sprites_x, screen_left + self.view_width + self.margin)
+
+        if frame != self.frame:
+            self.frame = frame
+            self.set_frame(start, end)
+        else:
+            # Only the sprites that just came into view can be behind
+            self.set_frame(start, min(end, self.visible_start))
+            self.set_frame(max(start, self.visible_end), end)
+
+        self.visible_start = start
+        self.visible_end = end
@@ -0,0 +1,135 @@
+import arcade
+import threading
+import weakref
+
+
+class AssetRegistry:
+    """
+    Hands out shared textures keyed by path and flip flags.
+    Each sprite that asks for a texture holds a reference to it, and the
+    reference is dropped when the sprite is garbage collected. Textures that
+    nothing references any more are released by purge(), which is meant to
+    be called between worlds. Textures that are shared at class level, such
+    as the coin spin, are loaded as permanent and never released.
+
+    Sprites are also built on the level loader thread (see level_cache.py),
+    so every method holds the lock while it touches the tables.
+    """
+
+    def __init__(self):
+        # Re-entrant, since a garbage collection inside a locked method can
+        # run a finalizer that calls release() on the same thread
+        self.lock = threading.RLock()
+
+        # (path, flipped_horizontally, flipped_vertically) -> Texture
+        self.textures = {}
+        # (path, flipped_horizontally, flipped_vertically) -> reference count
+        self.ref_counts = {}
+        # Keys of the textures that are kept for as long as the process runs
+        self.permanent = set()
+
+        # Counters so we can see how well the cache is doing
+        self.hits = 0
+        self.misses = 0
+        self.released = 0
+
+    def load_texture(self, path, flipped_horizontally=False, flipped_vertically=False, owner=None,
+                     permanent=False):
+        """
+        Get the shared texture for this path and set of flip flags, loading it
+        the first time it is asked for. If an owner is given, the reference is
+        released automatically when the owner is garbage collected. Without an
+        owner the texture stays referenced until release() is called, unless
+        it is permanent, in which case purge() never releases it.
+        """
+        key = (path, flipped_horizontally, flipped_vertically)
+
+        with self.lock:
+            texture = self.textures.get(key)
+            if texture is None:
+                self.misses += 1
+                # Bypass arcade's own cache, we decide when the texture goes away
+                texture = arcade.load_texture(path,
+                                              flipped_horizontally=flipped_horizontally,
+                                              flipped_vertically=flipped_vertically,
+                                              can_cache=False)
+                self.textures[key] = texture
+                self.ref_counts[key] = 0
+            else:
+                self.hits += 1
+
+            if permanent:
+                self.permanent.add(key)
+            else:
+                self.ref_counts[key] += 1
+
+        if owner is not None:
+            weakref.finalize(owner, self.release, path, flipped_horizontally, flipped_vertically)
+
+        return texture
+
+    def load_textures(self, paths, flipped_horizontally=False, flipped_vertically=False, owner=None,
+                      permanent=False):
+        """Load a list of textures, used for animation sequences"""
+        return [self.load_texture(path, flipped_horizontally, flipped_vertically, owner, permanent)
+                for path in paths]
+
+    def release(self, path, flipped_horizontally=False, flipped_vertically=False):
+        """Drop one reference to a texture"""
+        key = (path, flipped_horizontally, flipped_vertically)
+        with self.lock:
+            if key in self.ref_counts:
+                self.ref_counts[key] -= 1
+
+    def purge(self):
+        """
+        Forget every texture that nothing references any more.
+        Returns the number of textures that were released.
+
+        Sprites sit in reference cycles with their sprite lists, so the ones
+        from the last world may not have been collected yet. Their textures
+        are released by a later purge, once the garbage collector has run
+        their finalizers.
+        """
+        with self.lock:
+            unused = [key for key, count in self.ref_counts.items()
+                      if count <= 0 and key not in self.permanent]
+            for key in unused:
+                texture = self.textures.pop(key)
+                del self.ref_counts[key]
+                self.drop_from_arcade(texture, key[0])
+
+            self.released += len(unused)
+        return len(unused)
+
+    def drop_from_arcade(self, texture, path):
+        # arcade keeps the decoded image around in its own cache, and in the
+        # texture atlas once the texture has been drawn
+        texture_cache = arcade.load_texture.texture_cache
+        texture_cache.pop(texture.name, None)
+        if not any(key[0] == path for key in self.textures):
+            texture_cache.pop(path, None)
+
+        try:
+            atlas = arcade.get_window().ctx.default_atlas
+        except Exception:
+            # No window, so nothing was ever uploaded
+            return
+        if atlas.has_texture(texture):
+            atlas.remove(texture)
+
+    def stats(self):
+        """Hit/miss counters and the number of textures currently held"""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'released': self.released,
+                'loaded': len(self.textures),
+                'referenced': sum(1 for count in self.ref_counts.values() if count > 0),
+                'permanent': len(self.permanent),
+            }
+
+
+# Process-wide registry shared by all of the sprite classes
+registry = AssetRegistry()
@@ -0,0 +1,256 @@
+import array
+import io
+import sys
+import time
+import wave
+
+import arcade
+import pyglet.media as media
+from pyglet.event import EVENT_HANDLED
+
+# Number of sound effects that can play at the same time
+VOICE_COUNT = 8
+
+# How many copies of one effect can overlap, unless it says otherwise
+DEFAULT_MAX_CONCURRENT = 2
+
+# Samples within this distance of the resting level count as silence
+SILENCE_THRESHOLD = 64
+
+# A quiet tail shorter than this, in seconds, is part of the sound rather
+# than the silence after it, and is left alone
+MIN_SILENCE = 0.01
+
+
+def decode_effect(path):
+    """
+    Decode a .wav file into a compact in-memory source.
+    Stereo is mixed down to mono, and a silent tail is cut off along with
+    the DC offset it sits at, so short effects only keep the part you can hear.
+    """
+    with wave.open(path) as wav_file:
+        channels = wav_file.getnchannels()
+        sample_rate = wav_file.getframerate()
+        if wav_file.getsampwidth() != 2:
+            # Only 16 bit files are compacted, let pyglet decode the rest
+            return media.load(path, streaming=False)
+        samples = array.array("h", wav_file.readframes(wav_file.getnframes()))
+
+    if sys.byteorder != "little":
+        samples.byteswap()
+
+    if channels == 2:
+        samples = array.array("h", [(left + right) // 2 for left, right in zip(samples[::2], samples[1::2])])
+
+    # Find the flat stretch the sound ends on
+    end = len(samples)
+    if samples:
+        while end > 0 and abs(samples[end - 1] - samples[-1]) <= SILENCE_THRESHOLD:
+            end -= 1
+
+    resting = 0
+    if len(samples) - end >= MIN_SILENCE * sample_rate:
+        # That stretch is silence, and its average level is the DC offset
+        tail = samples[end:]
+        resting = round(sum(tail) / len(tail))
+    else:
+        # The sound doesn't come to rest, keep all of it
+        end = len(samples)
+
+    if resting:
+        compact = array.array("h", [max(-32768, min(32767, sample - resting)) for sample in samples[:end]])
+    else:
+        compact = samples[:end]
+
+    if sys.byteorder != "little":
+        compact.byteswap()
+
+    # Hand it to pyglet as a mono wav in memory, which it decodes into a
+    # static source that any number of players can queue
+    wav_data = io.BytesIO()
+    with wave.open(wav_data, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(compact.tobytes())
+    wav_data.seek(0)
+    return media.load(path, file=wav_data, streaming=False)
+
+
+class Effect:
+    """A decoded sound effect and how many copies of it may overlap"""
+
+    def __init__(self, name, source, max_concurrent=DEFAULT_MAX_CONCURRENT, priority=0):
+        self.name = name
+        self.source = source
+        self.duration = source.duration
+        self.max_concurrent = max_concurrent
+
+        # A play can only take a voice from an effect with the same or lower priority
+        self.priority = priority
+
+        # Size of the decoded sound, for comparing with the file on disk
+        self.size = int(self.duration * source.audio_format.bytes_per_second)
+
+
+class Voice:
+    """
+    One slot of the voice pool, and the player it keeps for its whole life.
+    Each play swaps the effect in on that player, so the audio driver's
+    player is made once instead of for every sound.
+    """
+
+    def __init__(self):
+        self.player = media.Player()
+        # pyglet deletes the driver's player when a source runs out, pause instead
+        self.player.push_handlers(on_eos=self.on_eos)
+        self.effect = None
+        self.started = 0
+        self.ends = 0
+
+    def on_eos(self):
+        self.player.pause()
+        return EVENT_HANDLED
+
+    def is_free(self, now):
+        return self.effect is None or now >= self.ends
+
+    def start(self, effect, volume, now):
+        player = self.player
+        player.pause()
+        had_source = player.source is not None
+        player.queue(effect.source)
+        if had_source:
+            # Drop the last effect and rewind to the new one
+            player.next_source()
+        player.volume = volume
+        player.play()
+
+        self.effect = effect
+        self.started = now
+        self.ends = now + effect.duration
+
+    def stop(self):
+        self.player.pause()
+        self.effect = None
+
+
+class AudioManager:
+    """
+    Plays sound effects through a fixed pool of voices.
+    Every effect has a limit on how many copies of it can overlap. Going over
+    that limit restarts its oldest copy. When every voice is busy, the oldest
+    voice playing something of the same or lower priority is stolen, and if
+    there isn't one the play is dropped.
+    Music is kept out of the pool, and is always allowed to play.
+    With audio turned off (headless runs) nothing is loaded or played.
+    """
+
+    def __init__(self, enabled=True, voice_count=VOICE_COUNT):
+        self.enabled = enabled
+        # No players are made when audio is off
+        self.voices = [Voice() for _ in range(voice_count)] if enabled else []
+
+        # Counters for monitoring
+        self.plays = 0
+        # Voices taken over from a different effect, which is what says
+        # whether the pool is big enough. An effect that is over its own
+        # limit restarting one of its copies is counted apart.
+        self.stolen_voices = 0
+        self.restarted_plays = 0
+        self.dropped_plays = 0
+
+    def load_effect(self, path, max_concurrent=DEFAULT_MAX_CONCURRENT, priority=0):
+        """Decode a sound effect once, up front"""
+        if not self.enabled:
+            return None
+        return Effect(path, decode_effect(path), max_concurrent, priority)
+
+    def load_music(self, path):
+        if not self.enabled:
+            return None
+        return arcade.load_sound(path)
+
+    def _find_voice(self, effect, now):
+        """Pick the voice a new play of the effect should use, or None to drop it"""
+        playing = [voice for voice in self.voices if not voice.is_free(now)]
+
+        # Too many copies of this effect already, restart the oldest one
+        copies = [voice for voice in playing if voice.effect is effect]
+        if len(copies) >= effect.max_concurrent:
+            return min(copies, key=lambda voice: voice.started)
+
+        for voice in self.voices:
+            if voice.is_free(now):
+                return voice
+
+        # Pool is full, steal from something no more important than this
+        candidates = [voice for voice in playing if voice.effect.priority <= effect.priority]
+        if candidates:
+            return min(candidates, key=lambda voice: voice.started)
+        return None
+
+    def play(self, effect, volume=1.0):
+        """Play a sound effect, returns the pyglet player or None if it was dropped"""
+        if not self.enabled or effect is None:
+            return None
+
+        now = time.perf_counter()
+        voice = self._find_voice(effect, now)
+        if voice is None:
+            self.dropped_plays += 1
+            return None
+
+        if not voice.is_free(now):
+            if voice.effect is effect:
+                self.restarted_plays += 1
+            else:
+                self.stolen_voices += 1
+        voice.start(effect, volume, now)
+
+        self.plays += 1
+        return voice.player
+
+    def play_music(self, music, volume=1.0):
+        if not self.enabled or music is None:
+            return None
+        return arcade.play_sound(music, volume=volume)
+
+    def stop(self, player):
+        """Stop a sound effect or the music"""
+        if not self.enabled or player is None:
+            return
+        for voice in self.voices:
+            if voice.player is player:
+                voice.stop()
+                return
+        arcade.stop_sound(player)
+
+    def is_playing(self, player):
+        if not self.enabled or player is None:
+            return False
+        return player.playing
+
+    def update(self):
+        """Hand the voices of finished effects back to the pool"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        for voice in self.voices:
+            if voice.effect is not None and voice.is_free(now):
+                voice.stop()
+
+    @property
+    def active_voices(self):
+        now = time.perf_counter()
+        return sum(1 for voice in self.voices if not voice.is_free(now))
+
+    def stats(self):
+        return {
+            'active_voices': self.active_voices,
+            'voice_count': len(self.voices),
+            'plays': self.plays,
+            'stolen_voices': self.stolen_voices,
+            'restarted_plays': self.restarted_plays,
+            'dropped_plays': self.dropped_plays,
+        }
@@ -0,0 +1,236 @@
+"""
+Frame time benchmark.
+
+Plays a scripted route through each world headless and reports how long the
+ticks spent playing the level took (p50/p95/p99/max), how long the world
+took to load and the peak memory use. The routes are input recordings (see input_replay.py), so every
+run plays exactly the same way.
+
+Results are written to a JSON file. When a baseline file exists the results
+are compared with it, and the run fails if any of them got worse by more
+than the tolerance. Baselines depend on the machine, so make one locally:
+
+    python benchmark.py --update-baseline
+    ... change something ...
+    python benchmark.py
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import arcade
+
+import super_mario as main
+from fixed_timestep import TICK_RATE
+from frame_stats import percentile
+from input_replay import Recording, create_game
+from level_cache import LevelCache
+
+BASELINE_PATH = "benchmark_baseline.json"
+RESULTS_PATH = "benchmark_results.json"
+
+# How long each route runs, in ticks
+ROUTE_TICKS = 3000
+
+# Every route starts from a fresh save with this many lives
+ROUTE_LIVES = 6
+
+# A result this much worse than the baseline, as a fraction, is a regression
+TOLERANCE = 0.25
+
+# Differences smaller than these are timer noise, not regressions
+NOISE_FLOOR = {
+    'p50_ms': 0.05,
+    'p95_ms': 0.1,
+    'p99_ms': 0.25,
+    'first_load_ms': 5,
+    'reload_ms': 2,
+    'peak_memory_kb': 256,
+}
+
+# Worst tick times jump around from run to run too much to fail on, so
+# only the metrics above are checked. max_ms is reported all the same.
+CHECKED_METRICS = list(NOISE_FLOOR)
+
+
+def build_route(stage, ticks=ROUTE_TICKS, jump_ticks=45):
+    """
+    A route that sprints right from the end of the intro, jumping every
+    jump_ticks ticks. The keys stay held through respawns.
+    """
+    route = Recording(TICK_RATE, stage, ROUTE_LIVES, 0, 0)
+    route.ticks = ticks
+
+    start_tick = main.INTRO_FRAME_COUNT
+    route.events.append((start_tick, arcade.key.D, True))
+    route.events.append((start_tick, arcade.key.J, True))
+    for tick in range(start_tick, ticks, jump_ticks):
+        route.events.append((tick, arcade.key.W, True))
+    return route
+
+
+# Jumping every 15 ticks gets furthest through 1-1 and 1-2. Nothing simple
+# gets past the first wall in 1-3, but its ticks are the most expensive anyway.
+ROUTES = {
+    "1-1": build_route("1-1", jump_ticks=15),
+    "1-2": build_route("1-2", jump_ticks=15),
+    "1-3": build_route("1-3"),
+}
+
+
+def prepare_bundles():
+    """Make sure every world has an up to date bundle, so loads are timed the same way each run"""
+    level_cache = LevelCache(background=False)
+    for stage in main.STAGES:
+        level_cache.load(main.get_map_name(stage), main.TILE_SCALING, main.LAYER_OPTIONS)
+    level_cache.close()
+
+
+def is_playing(game):
+    """False during the intro, death and game over screens, where a tick does next to nothing"""
+    return not (game.stage_intro or game.is_defeated or game.no_lives or game.quest_bool)
+
+
+def play_route(route):
+    """
+    Play a route, returns the time of each tick spent playing the level and
+    of each world load, in seconds
+    """
+    game = create_game(route, headless=True)
+    level_cache = game.level_cache
+
+    # Loads are counted when the game collects them, the first one at the end of the intro
+    load_times = []
+    loads_seen = level_cache.hits + level_cache.misses
+
+    tick_times = []
+    for _ in range(route.ticks):
+        playing = is_playing(game)
+        start = time.perf_counter()
+        game.tick()
+        if playing:
+            tick_times.append(time.perf_counter() - start)
+
+        loads = level_cache.hits + level_cache.misses
+        if loads != loads_seen:
+            loads_seen = loads
+            load_times.append(level_cache.last_load_time)
+
+    level_cache.close()
+    return game, tick_times, load_times
+
+
+def measure_peak_memory(route):
+    """Play a route again under tracemalloc, which slows it down too much to time it at the same time"""
+    tracemalloc.start()
+    game, _, _ = play_route(route)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def run_route(route):
+    game, tick_times, load_times = play_route(route)
+    peak_memory = measure_peak_memory(route)
+    return {
+        'ticks': route.ticks,
+        'play_ticks': len(tick_times),
+        'p50_ms': percentile(tick_times, 0.5) * 1000,
+        'p95_ms': percentile(tick_times, 0.95) * 1000,
+        'p99_ms': percentile(tick_times, 0.99) * 1000,
+        'max_ms': max(tick_times) * 1000,
+        'mean_ms': sum(tick_times) / len(tick_times) * 1000,
+        'first_load_ms': load_times[0] * 1000,
+        'reload_ms': max(load_times[1:], default=0) * 1000,
+        'loads': len(load_times),
+        'peak_memory_kb': peak_memory / 1024,
+        # Where the route ended up. If this changes, the game plays
+        # differently and the timings aren't comparable with the baseline.
+        'final_state': {
+            'world': game.mario_world,
+            'score': game.score,
+            'coins': game.coin_count,
+            'lives': game.lives,
+        },
+    }
+
+
+def find_regressions(results, baseline, tolerance=TOLERANCE):
+    """Every checked metric that got worse than the baseline, as readable lines"""
+    regressions = []
+    for stage, result in results['routes'].items():
+        baseline_result = baseline['routes'].get(stage)
+        if baseline_result is None:
+            continue
+        for metric in CHECKED_METRICS:
+            value = result[metric]
+            baseline_value = baseline_result[metric]
+            if value > baseline_value * (1 + tolerance) and value - baseline_value > NOISE_FLOOR[metric]:
+                regressions.append(f"{stage} {metric}: {value:.3f} (baseline {baseline_value:.3f})")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'route':<6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'load':>8} {'reload':>8} {'peak mem':>10}")
+    for stage, result in results['routes'].items():
+        print(f"{stage:<6} {result['p50_ms']:>6.3f}ms {result['p95_ms']:>6.3f}ms {result['p99_ms']:>6.3f}ms "
+              f"{result['max_ms']:>6.2f}ms {result['first_load_ms']:>6.2f}ms {result['reload_ms']:>6.2f}ms "
+              f"{result['peak_memory_kb']:>8.0f}KB")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description="Time scripted routes through every world")
+    parser.add_argument("--routes", nargs="+", default=list(ROUTES), help="worlds to run, such as 1-1 1-2")
+    parser.add_argument("--output", default=RESULTS_PATH, help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown, 0.25 is 25%%")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args()
+
+    prepare_bundles()
+
+    results = {
+        'python': sys.version.split()[0],
+        'routes': {stage: run_route(ROUTES[stage]) for stage in args.routes},
+    }
+    print_results(results)
+
+    with open(args.output, "w") as results_file:
+        json.dump(results, results_file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f"baseline stored in {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --update-baseline to store one")
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    for stage, result in results['routes'].items():
+        baseline_result = baseline['routes'].get(stage)
+        if baseline_result is not None and result['final_state'] != baseline_result['final_state']:
+            print(f"warning: route {stage} ended differently from the baseline, "
+                  f"{result['final_state']} vs {baseline_result['final_state']}")
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    if regressions:
+        print("regressions against the baseline:")
+        for regression in regressions:
+            print("  " + regression)
+        return 1
+
+    print("no regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
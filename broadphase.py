@@ -0,0 +1,26 @@
+def get_nearby_sprites(sprite, sprite_list):
+    """
+    Broad phase: the sprites from sprite_list that share a spatial hash
+    cell with the sprite. Falls back to the whole list if it has no hash.
+    """
+    if sprite_list.spatial_hash:
+        return sprite_list.spatial_hash.get_objects_for_box(sprite)
+    return sprite_list
+
+
+def get_shell_collisions(shell_list, enemy_lists):
+    """
+    Get (shell, enemy) pairs that are touching.
+    Shells that are not moving are skipped, and each moving shell is only
+    tested against the enemies in the cells around it, so the cost follows
+    the number of moving shells rather than the number of enemies.
+    """
+    hits = []
+    for shell in shell_list:
+        if shell.change_x == 0:
+            continue
+        for enemy_list in enemy_lists:
+            for enemy in get_nearby_sprites(shell, enemy_list):
+                if enemy is not shell and shell.collides_with_sprite(enemy):
+                    hits.append((shell, enemy))
+    return hits
@@ -0,0 +1,98 @@
+import arcade
+
+# Width of one chunk of a static layer, in pixels. About a screen wide, so
+# two or three chunks of each layer are on screen at a time.
+CHUNK_WIDTH = 640
+
+
+class ChunkedLayer:
+    """
+    A layer that doesn't move sideways, split into column chunks that each
+    have their own SpriteList, so only the chunks on screen get drawn.
+
+    The sprites stay in the layer's own list too, which is what the game
+    logic uses. A sprite can be in any number of lists and changes to it
+    reach all of them, so breaking a block, bumping a box or changing a
+    texture only updates the one chunk that sprite is in. Nothing is
+    rebuilt while the level is played.
+    """
+
+    def __init__(self, sprite_list, chunk_width=CHUNK_WIDTH):
+        columns = {}
+        for sprite in sprite_list:
+            columns.setdefault(int(sprite.center_x // chunk_width), []).append(sprite)
+
+        # (left, right, SpriteList) in x order. A chunk covers every pixel its
+        # sprites do, so a wide sprite (the background) keeps its chunk drawn.
+        self.chunks = []
+        for column in sorted(columns):
+            sprites = columns[column]
+            chunk = arcade.SpriteList()
+            chunk.extend(sprites)
+            left = min(sprite.left for sprite in sprites)
+            right = max(sprite.right for sprite in sprites)
+            self.chunks.append((left, right, chunk))
+
+    def release(self):
+        """
+        Take the sprites out of the chunks. The static layers are reused on
+        every respawn, so their sprites would otherwise keep every chunk
+        they were ever put in.
+        """
+        for _, _, chunk in self.chunks:
+            chunk.clear()
+        self.chunks = []
+
+    def draw(self, view_left, view_right, **kwargs):
+        """Draw the chunks that overlap the view, returns (draw calls, sprites drawn)"""
+        draw_calls = 0
+        sprite_count = 0
+        for left, right, chunk in self.chunks:
+            if right < view_left or left > view_right or not chunk:
+                continue
+            chunk.draw(**kwargs)
+            draw_calls += 1
+            sprite_count += len(chunk)
+        return draw_calls, sprite_count
+
+
+class ChunkedScene:
+    """
+    Draws a Scene in its layer order, the static layers chunk by chunk and
+    the rest (enemies, Mario) whole, and counts what was drawn.
+    """
+
+    def __init__(self, scene, static_layer_names, chunk_width=CHUNK_WIDTH):
+        self.scene = scene
+
+        # id of a scene SpriteList -> its ChunkedLayer
+        self.chunked_layers = {}
+        for name in static_layer_names:
+            if name in scene.name_mapping:
+                sprite_list = scene[name]
+                self.chunked_layers[id(sprite_list)] = ChunkedLayer(sprite_list, chunk_width)
+
+        # What the last draw() submitted. Sprites are drawn as one vertex each,
+        # which the sprite shader turns into a quad.
+        self.draw_calls = 0
+        self.vertices = 0
+
+    def release(self):
+        for chunked_layer in self.chunked_layers.values():
+            chunked_layer.release()
+        self.chunked_layers = {}
+
+    def draw(self, view_left, view_right, **kwargs):
+        self.draw_calls = 0
+        self.vertices = 0
+        for sprite_list in self.scene.sprite_lists:
+            chunked_layer = self.chunked_layers.get(id(sprite_list))
+            if chunked_layer is not None:
+                draw_calls, sprite_count = chunked_layer.draw(view_left, view_right, **kwargs)
+            elif sprite_list:
+                sprite_list.draw(**kwargs)
+                draw_calls, sprite_count = 1, len(sprite_list)
+            else:
+                continue
+            self.draw_calls += draw_calls
+            self.vertices += sprite_count
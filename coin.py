@@ -1,6 +1,17 @@
 import arcade
+from asset_registry import registry
 
 class Coin(arcade.Sprite):
+
+    # Ticks each frame of the spin is shown for. Every coin in a layer spins
+    # together, played by animation.LayerAnimator.
+    FRAME_TICKS = (16, 5, 5, 5)
+
+    # Frames of the spin, loaded by the first coin, shared by all of them and
+    # kept for good. Coins hold nothing of their own beyond what every Sprite
+    # has, which keeps their attribute dicts compact.
+    animation_textures = None
+
     def __init__(
         self,
         filename: str = None,
@@ -34,46 +45,19 @@ class Coin(arcade.Sprite):
             center_y=center_y,
         )
 
-        # Used for flipping between image sequences
-        self.cur_texture = 0
         self.scale = scale
 
         # --- Load Textures ---
         main_path = "resources/sprites/"
 
-        self.coin_textures = []
-        for i in range(1, 5):
-            texture = arcade.load_texture(f"{main_path}coin_{i}.png")
-            self.coin_textures.append(texture)
+        if Coin.animation_textures is None:
+            Coin.animation_textures = registry.load_textures(
+                [f"{main_path}coin_{i}.png" for i in range(1, 5)], permanent=True)
 
         # Set the initial texture
-        self.texture = self.coin_textures[0]
-
+        self.texture = self.animation_textures[0]
 
         # Hit box will be set based on the first image used. If you want to specify
         # a different hit box, you can do it like the code below.
         # set_hit_box = [[-22, -64], [22, -64], [22, 28], [-22, 28]]
         self.hit_box = self.texture.hit_box_points
-
-        self.update_counter = 0
-
-    def update_animation(self, delta_time: float = 1 / 60):
-        
-        if self.update_counter >= 5 and self.update_counter <= 15:
-            if self.cur_texture == 0:
-                self.update_counter += 1
-                return
-            self.cur_texture += 1
-            if self.cur_texture > 3:
-                self.cur_texture = 0
-            self.texture = self.coin_textures[self.cur_texture]
-            self.update_counter = 0
-        elif self.update_counter > 15:
-            self.cur_texture += 1
-            if self.cur_texture > 3:
-                self.cur_texture = 0
-            self.texture = self.coin_textures[self.cur_texture]
-            self.update_counter = 0
-        
-        # Update our counter
-        self.update_counter += 1
\ No newline at end of file
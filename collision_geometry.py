@@ -0,0 +1,100 @@
+import weakref
+
+import arcade
+
+# Merged walls of each tile layer. The static layers are handed back
+# unchanged on every respawn (see level_cache.py), so they are only
+# merged once per world.
+_merged_walls = weakref.WeakKeyDictionary()
+
+
+def is_full_tile(sprite, width, height):
+    """True if the sprite's hit box is its whole unrotated square"""
+    if sprite.angle or sprite.width != width or sprite.height != height:
+        return False
+    left, right, bottom, top = sprite.left, sprite.right, sprite.bottom, sprite.top
+    return sorted(map(tuple, sprite.get_adjusted_hit_box())) == sorted([(left, bottom), (left, top),
+                                                                         (right, bottom), (right, top)])
+
+
+def find_rectangles(tiles, width, height):
+    """
+    Greedily cover the tiles with as few rectangles as it can, as
+    (left, bottom, right, top). Each row is cut into runs of touching tiles
+    first, then a run is stretched up over the runs above it that span
+    exactly the same columns, so a ground row becomes one rectangle and a
+    pipe becomes one or two.
+    """
+    rows = {}
+    for tile in tiles:
+        rows.setdefault(tile.bottom, []).append(tile.left)
+
+    # (left, right) -> the rectangle that ends at the row below, to stretch
+    open_rectangles = {}
+    rectangles = []
+    for bottom in sorted(rows):
+        lefts = sorted(set(rows[bottom]))
+        runs = []
+        run_left = lefts[0]
+        for previous, left in zip(lefts, lefts[1:]):
+            if left != previous + width:
+                runs.append((run_left, previous + width))
+                run_left = left
+        runs.append((run_left, lefts[-1] + width))
+
+        still_open = {}
+        for run in runs:
+            rectangle = open_rectangles.get(run)
+            if rectangle is not None and rectangle[3] == bottom:
+                rectangle[3] = bottom + height
+            else:
+                rectangle = [run[0], bottom, run[1], bottom + height]
+                rectangles.append(rectangle)
+            still_open[run] = rectangle
+        open_rectangles = still_open
+
+    return [tuple(rectangle) for rectangle in rectangles]
+
+
+def make_wall(left, bottom, right, top):
+    """Invisible sprite that is only ever used to collide with"""
+    width = right - left
+    height = top - bottom
+    wall = arcade.Sprite(center_x=(left + right) / 2, center_y=(bottom + top) / 2)
+    wall.width = width
+    wall.height = height
+    wall.set_hit_box([(-width / 2, -height / 2), (width / 2, -height / 2),
+                      (width / 2, height / 2), (-width / 2, height / 2)])
+    return wall
+
+
+def get_merged_walls(sprite_list):
+    """
+    A stand-in for a layer of solid tiles when it is only used as walls,
+    with runs of tiles merged into larger rectangles so the physics has far
+    fewer sprites to test. Anything that isn't a plain square tile of the
+    usual size is kept as it is.
+
+    Only for layers that never change while the level is played, since the
+    merged walls don't follow the tiles.
+    """
+    walls = _merged_walls.get(sprite_list)
+    if walls is not None:
+        return walls
+
+    walls = arcade.SpriteList(use_spatial_hash=True, lazy=True)
+    if len(sprite_list):
+        width = sprite_list[0].width
+        height = sprite_list[0].height
+        tiles = []
+        for sprite in sprite_list:
+            if is_full_tile(sprite, width, height):
+                tiles.append(sprite)
+            else:
+                walls.append(sprite)
+        if tiles:
+            for rectangle in find_rectangles(tiles, width, height):
+                walls.append(make_wall(*rectangle))
+
+    _merged_walls[sprite_list] = walls
+    return walls
@@ -1,8 +1,5 @@
 import arcade
-from load_textures import load_texture_pair
-from typing import (
-    List
-)
+from asset_registry import registry
 
 # Constants used to track if the enemy is facing left or right
 RIGHT_FACING = 0
@@ -17,34 +14,40 @@ CHARACTER_SCALING = 2.5
 # Movement speed of enemy, in pixels per frame
 ENEMY_MOVEMENT_SPEED = 100
 
+# Walk cycle, and how long each frame of it shows in milliseconds
+WALK_TEXTURES = ["resources/sprites/koopa_1.png", "resources/sprites/koopa_2.png"]
+WALK_FRAME_DURATION = 150
+
 class Koopa(arcade.AnimatedTimeBasedSprite):
+
+    # Walk cycle facing each way, loaded by the first koopa and kept for good
+    l_frames = None
+    r_frames = None
+
     def __init__(self, filename, **kwargs): #5.19 #original ===self, name_folder, name_file):
         super().__init__()
         self.change_x = ENEMY_MOVEMENT_SPEED
         self.scale = CHARACTER_SCALING
-        self.r_texture1 = arcade.load_texture("resources/sprites/koopa_1.png", flipped_horizontally=False)
-        self.r_texture2 = arcade.load_texture("resources/sprites/koopa_2.png", flipped_horizontally=False)
-        self.l_texture1 = arcade.load_texture("resources/sprites/koopa_1.png", flipped_horizontally=True)
-        self.l_texture2 = arcade.load_texture("resources/sprites/koopa_2.png", flipped_horizontally=True)
-
-        self.l_frames = [arcade.AnimationKeyframe(0, 150, self.l_texture1), arcade.AnimationKeyframe(1, 150, self.l_texture2)]
-        self.r_frames = [arcade.AnimationKeyframe(0, 150, self.r_texture1), arcade.AnimationKeyframe(1, 150, self.r_texture2)]
 
-        self.hit = False
-        if filename == "resources/sprites/koopa_shell.png":
-            print("loading shells")
-            self.shell = arcade.load_texture(filename)
-            self.shell_frame = [arcade.AnimationKeyframe(0, 200, self.shell)]
+        # Every koopa shares the same frames. Shells are plain sprites, see
+        # Game.shell_list.
+        if Koopa.l_frames is None:
+            r_textures = registry.load_textures(WALK_TEXTURES, permanent=True)
+            l_textures = registry.load_textures(WALK_TEXTURES, flipped_horizontally=True, permanent=True)
+            Koopa.l_frames = [arcade.AnimationKeyframe(index, WALK_FRAME_DURATION, texture)
+                              for index, texture in enumerate(l_textures)]
+            Koopa.r_frames = [arcade.AnimationKeyframe(index, WALK_FRAME_DURATION, texture)
+                              for index, texture in enumerate(r_textures)]
 
         # Set initial texture
-        self.texture = self.l_texture1
+        self.texture = self.l_frames[0].texture
         self.hit_box = self.texture.hit_box_points
 
     
     def update_animation(self, delta_time: float = 1/60):
-        if self.change_x < 0 and not self.hit:
+        if self.change_x < 0:
             self.frames = self.r_frames
-        elif self.change_x > 0 and not self.hit:
+        elif self.change_x > 0:
             self.frames = self.l_frames
         
-        super().update_animation()
\ No newline at end of file
+        super().update_animation()
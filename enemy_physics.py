@@ -0,0 +1,312 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from physics_bodies import PhysicsBodyManager
+
+# Edges that land exactly on a cell boundary only touch the next cell, the
+# same as two sprites that only touch don't collide
+EDGE_EPSILON = 1e-6
+
+
+class WallGrid:
+    """
+    The walls as a grid of cells, each holding how many wall sprites cover
+    it, so a body can look up whether the cells around it are solid instead
+    of testing every wall near it.
+    Cells are counted rather than just marked so a block can be taken out of
+    a cell that some other wall also covers.
+
+    A wall taken out of its sprite list, such as a broken block, is taken
+    out of the grid by the next sync().
+    """
+
+    def __init__(self, wall_lists, cell_size):
+        self.cell_size = cell_size
+        self.wall_lists = wall_lists
+
+        walls = [wall for wall_list in wall_lists for wall in wall_list]
+        columns = max((self.get_column(wall.right - EDGE_EPSILON) + 1 for wall in walls), default=1)
+        rows = max((self.get_row(wall.top - EDGE_EPSILON) + 1 for wall in walls), default=1)
+        self.counts = np.zeros((columns, rows), dtype=np.int16)
+
+        # For each wall list, wall -> the cells it was counted in. A bumped
+        # block moves a little, so it is taken out of the cells it went in.
+        self.wall_cells = [{} for _ in wall_lists]
+        for wall_list, wall_cells in zip(wall_lists, self.wall_cells):
+            for wall in wall_list:
+                self.add(wall, wall_cells)
+
+    def get_column(self, x):
+        return math.floor(x / self.cell_size)
+
+    def get_row(self, y):
+        return math.floor(y / self.cell_size)
+
+    def get_cells(self, wall):
+        """Slices of the grid the wall covers, clipped to the grid"""
+        columns, rows = self.counts.shape
+        first_column = max(self.get_column(wall.left), 0)
+        last_column = min(self.get_column(wall.right - EDGE_EPSILON) + 1, columns)
+        first_row = max(self.get_row(wall.bottom), 0)
+        last_row = min(self.get_row(wall.top - EDGE_EPSILON) + 1, rows)
+        return slice(first_column, last_column), slice(first_row, last_row)
+
+    def add(self, wall, wall_cells):
+        cells = self.get_cells(wall)
+        self.counts[cells] += 1
+        wall_cells[wall] = cells
+
+    def remove(self, wall, wall_cells):
+        self.counts[wall_cells.pop(wall)] -= 1
+
+    def sync(self):
+        """Take out the walls that have been removed from their lists since last time"""
+        for wall_list, wall_cells in zip(self.wall_lists, self.wall_cells):
+            # Walls are only ever removed during play, so a list that is
+            # still the same length hasn't changed
+            if len(wall_list) == len(wall_cells):
+                continue
+            for wall in [wall for wall in wall_cells if not wall.sprite_lists]:
+                self.remove(wall, wall_cells)
+
+    def is_solid(self, x, y):
+        """For arrays of points, whether each one is inside a wall. Outside the grid is open."""
+        columns = np.floor(x / self.cell_size).astype(np.intp)
+        rows = np.floor(y / self.cell_size).astype(np.intp)
+        inside = (columns >= 0) & (columns < self.counts.shape[0]) & (rows >= 0) & (rows < self.counts.shape[1])
+        solid = np.zeros(len(x), dtype=bool)
+        solid[inside] = self.counts[columns[inside], rows[inside]] > 0
+        return solid
+
+    def is_box_solid(self, left, right, bottom, top):
+        """For arrays of boxes, whether each one overlaps a wall"""
+        solid = np.zeros(len(left), dtype=bool)
+        right = right - EDGE_EPSILON
+        top = top - EDGE_EPSILON
+        # Bodies are no bigger than a few cells, so checking a point every
+        # cell along each side and the far corners covers every cell they touch
+        width_steps = int(np.max(right - left, initial=0) // self.cell_size) + 1
+        height_steps = int(np.max(top - bottom, initial=0) // self.cell_size) + 1
+        for step_x in range(width_steps + 1):
+            x = np.minimum(left + step_x * self.cell_size, right)
+            for step_y in range(height_steps + 1):
+                y = np.minimum(bottom + step_y * self.cell_size, top)
+                solid |= self.is_solid(x, y)
+        return solid
+
+
+def get_hit_box_offsets(sprite):
+    """Where the sprite's hit box is relative to its center, as (left, right, bottom, top)"""
+    return (sprite.left - sprite.center_x, sprite.right - sprite.center_x,
+            sprite.bottom - sprite.center_y, sprite.top - sprite.center_y)
+
+
+class BodyGroup:
+    """
+    Sprites that are simulated together, each with a row of numbers that
+    don't change while it lives (where its hit box is and so on)
+    """
+
+    def __init__(self, row_size):
+        self.sprites = []
+        self.sprite_set = set()
+        self.rows = np.zeros((0, row_size))
+
+    def add(self, sprite, row):
+        """False if the sprite is already in the group"""
+        if sprite in self.sprite_set:
+            return False
+        self.sprites.append(sprite)
+        self.sprite_set.add(sprite)
+        self.rows = np.vstack([self.rows, row])
+        return True
+
+    def remove(self, sprite):
+        """False if the sprite isn't in the group"""
+        if sprite not in self.sprite_set:
+            return False
+        index = self.sprites.index(sprite)
+        del self.sprites[index]
+        self.sprite_set.remove(sprite)
+        self.rows = np.delete(self.rows, index, axis=0)
+        return True
+
+    def retire_removed(self):
+        """Drop the sprites that have been taken out of the level, returns how many"""
+        live = [index for index, sprite in enumerate(self.sprites) if sprite.sprite_lists]
+        retired = len(self.sprites) - len(live)
+        if retired:
+            self.sprites = [self.sprites[index] for index in live]
+            self.sprite_set = set(self.sprites)
+            self.rows = self.rows[live]
+        return retired
+
+    def get_awake(self, is_dormant=None):
+        """Indexes of the sprites that is_dormant(sprite) doesn't say are asleep"""
+        return [index for index, sprite in enumerate(self.sprites)
+                if is_dormant is None or not is_dormant(sprite)]
+
+    def __len__(self):
+        return len(self.sprites)
+
+
+class BatchedPhysicsBodies:
+    """
+    Physics for everything other than Mario, stepped together with NumPy
+    instead of one arcade engine per sprite. Has the same interface as
+    PhysicsBodyManager.
+
+    Mushrooms fall and hit walls. Every update their positions and
+    velocities are gathered into arrays, gravity is applied and they move
+    on the y axis then the x axis, the same order Mario's engine uses, and
+    any body that ends up in a wall cell is put back against the edge of
+    that cell. Hitting a floor or ceiling stops a body's fall or rise,
+    hitting a side leaves change_x alone so the sprite can see it didn't
+    move and turn around. A body that starts a step inside a wall, such as
+    a mushroom rising out of its box, moves through walls until it is clear
+    of them.
+
+    Enemies and shells patrol, moving the same as physics_bodies.move_patrol
+    does one sprite at a time.
+    """
+
+    def __init__(self, walls, gravity_constant, cell_size):
+        self.gravity_constant = gravity_constant
+        self.grid = WallGrid(walls, cell_size)
+
+        # Each row is the hit box offsets
+        self.falling = BodyGroup(4)
+        # Each row is the hit box offsets, then the boundaries, NaN where
+        # there is none so no comparison with it is ever true
+        self.patrols = BodyGroup(8)
+
+        # Number of bodies that have been retired, for monitoring
+        self.retired_count = 0
+
+    def add(self, sprite):
+        """Give a sprite a physics body, if it does not have one already"""
+        self.falling.add(sprite, get_hit_box_offsets(sprite))
+
+    def add_patrol(self, sprite):
+        """
+        Give a sprite a patrol body, if it does not have one already. Its
+        boundaries are read now, so set them first.
+        """
+        # Like arcade, a side boundary of 0 counts as none
+        bounds = (sprite.boundary_left or np.nan, sprite.boundary_right or np.nan,
+                  np.nan if sprite.boundary_bottom is None else sprite.boundary_bottom,
+                  np.nan if sprite.boundary_top is None else sprite.boundary_top)
+        self.patrols.add(sprite, get_hit_box_offsets(sprite) + bounds)
+
+    def remove(self, sprite):
+        """Retire a sprite's body, if it has one, such as when it is stomped or collected"""
+        if self.falling.remove(sprite) or self.patrols.remove(sprite):
+            self.retired_count += 1
+
+    def update(self, is_dormant=None):
+        """
+        Update every live body, retiring the ones whose sprite is gone.
+        Bodies whose sprite is_dormant(sprite) says is asleep are skipped.
+        """
+        self.grid.sync()
+        self.retired_count += self.falling.retire_removed() + self.patrols.retire_removed()
+        self.update_falling(self.falling.get_awake(is_dormant))
+        self.update_patrols(self.patrols.get_awake(is_dormant))
+
+    def update_falling(self, moving):
+        if not moving:
+            return
+
+        sprites = [self.falling.sprites[index] for index in moving]
+        count = len(sprites)
+        x = np.fromiter((sprite.center_x for sprite in sprites), float, count)
+        y = np.fromiter((sprite.center_y for sprite in sprites), float, count)
+        change_x = np.fromiter((sprite.change_x for sprite in sprites), float, count)
+        change_y = np.fromiter((sprite.change_y for sprite in sprites), float, count)
+        left, right, bottom, top = self.falling.rows[moving].T
+
+        grid = self.grid
+        in_wall = grid.is_box_solid(x + left, x + right, y + bottom, y + top)
+
+        # --- Move in the y direction
+        change_y -= self.gravity_constant
+        y += change_y
+        hit = ~in_wall & grid.is_box_solid(x + left, x + right, y + bottom, y + top)
+        falling = hit & (change_y < 0)
+        rising = hit & (change_y > 0)
+        # Stand on the top of the cell the feet went into, or stop under the
+        # bottom of the one the head went into
+        y[falling] = (np.floor((y[falling] + bottom[falling]) / grid.cell_size) + 1) * grid.cell_size - bottom[falling]
+        y[rising] = np.floor((y[rising] + top[rising] - EDGE_EPSILON) / grid.cell_size) * grid.cell_size - top[rising]
+        change_y[hit] = 0
+
+        # --- Move in the x direction
+        x += change_x
+        hit = ~in_wall & grid.is_box_solid(x + left, x + right, y + bottom, y + top)
+        going_left = hit & (change_x < 0)
+        going_right = hit & (change_x > 0)
+        x[going_left] = (np.floor((x[going_left] + left[going_left]) / grid.cell_size) + 1) * grid.cell_size - left[going_left]
+        x[going_right] = np.floor((x[going_right] + right[going_right] - EDGE_EPSILON) / grid.cell_size) * grid.cell_size - right[going_right]
+
+        for sprite, new_x, new_y, new_change_y in zip(sprites, x.tolist(), y.tolist(), change_y.tolist()):
+            sprite.position = (new_x, new_y)
+            sprite.change_y = new_change_y
+
+    def update_patrols(self, awake):
+        # Standing enemies stay where they are, like arcade's moving platforms
+        moving = [index for index in awake
+                  if self.patrols.sprites[index].change_x or self.patrols.sprites[index].change_y]
+        if not moving:
+            return
+
+        sprites = [self.patrols.sprites[index] for index in moving]
+        count = len(sprites)
+        x = np.fromiter((sprite.center_x for sprite in sprites), float, count)
+        y = np.fromiter((sprite.center_y for sprite in sprites), float, count)
+        change_x = np.fromiter((sprite.change_x for sprite in sprites), float, count)
+        change_y = np.fromiter((sprite.change_y for sprite in sprites), float, count)
+        left, right, bottom, top, boundary_left, boundary_right, boundary_bottom, boundary_top = \
+            self.patrols.rows[moving].T
+
+        # Put a body that reached a boundary back on it, and turn it around
+        # if it was still heading past
+        past = x + left <= boundary_left
+        x[past] = boundary_left[past] - left[past]
+        change_x[past & (change_x < 0)] *= -1
+        past = x + right >= boundary_right
+        x[past] = boundary_right[past] - right[past]
+        change_x[past & (change_x > 0)] *= -1
+        x += change_x
+
+        past = y + top >= boundary_top
+        y[past] = boundary_top[past] - top[past]
+        change_y[past & (change_y > 0)] *= -1
+        past = y + bottom <= boundary_bottom
+        y[past] = boundary_bottom[past] - bottom[past]
+        change_y[past & (change_y < 0)] *= -1
+        y += change_y
+
+        for sprite, new_x, new_y, new_change_x, new_change_y in zip(sprites, x.tolist(), y.tolist(),
+                                                                    change_x.tolist(), change_y.tolist()):
+            sprite.position = (new_x, new_y)
+            sprite.change_x = new_change_x
+            sprite.change_y = new_change_y
+
+    @property
+    def live_count(self):
+        """Number of bodies that are currently being simulated"""
+        return len(self.falling) + len(self.patrols)
+
+
+def create_physics_bodies(walls, gravity_constant, cell_size):
+    """
+    Physics for everything other than Mario. Batched with NumPy when it is
+    installed, otherwise one sprite at a time.
+    """
+    if np is None:
+        return PhysicsBodyManager(walls, gravity_constant)
+    return BatchedPhysicsBodies(walls, gravity_constant, cell_size)
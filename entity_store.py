@@ -0,0 +1,26 @@
+from array import array
+
+
+class EntityStore:
+    """
+    Gameplay state for every entity of one kind in a level, such as all the
+    mushrooms, kept as one typed array per field instead of as attributes on
+    each sprite. The sprites are only what gets drawn and collided with.
+
+    Row i belongs to sprites[i]. Logic that runs over every entity is a
+    loop over the arrays. The rows are looked up here rather than stored on
+    the sprites, since one attribute more than a plain Sprite has makes
+    every sprite's attribute dict more than twice the size.
+    """
+
+    def __init__(self, sprite_lists):
+        self.sprites = [sprite for sprite_list in sprite_lists for sprite in sprite_list]
+        # sprite -> its row
+        self.entity_ids = {sprite: entity_id for entity_id, sprite in enumerate(self.sprites)}
+
+    def new_field(self, typecode, value=0):
+        """A typed array with one entry per entity, all starting at value"""
+        return array(typecode, [value]) * len(self.sprites)
+
+    def __len__(self):
+        return len(self.sprites)
@@ -0,0 +1,109 @@
+"""
+Fixed timestep game loop helpers.
+
+The game logic is written in ticks: speeds are pixels per tick, the level
+timer counts ticks and so on. FixedTimestep turns the uneven time between
+on_update calls into a whole number of ticks, so the game runs at the same
+speed on slow and fast machines. Interpolator smooths out the leftover
+fraction of a tick when drawing.
+"""
+
+import math
+
+# Game logic steps per second. Every speed and timer in the game is counted
+# in ticks and tuned for 60, so this is fixed rather than a setting.
+TICK_RATE = 60
+
+# Most ticks run in one frame. After a long stall (loading, a debugger, the
+# window being dragged) the rest of the missed time is dropped instead of
+# fast-forwarding through it.
+MAX_TICKS_PER_FRAME = 5
+
+# A sprite that moved further than this in one tick was placed somewhere new
+# (a pipe, a respawn), so it is drawn where it is instead of sliding there
+SNAP_DISTANCE = 64
+
+
+class FixedTimestep:
+    """Accumulates frame time and hands it out as fixed length ticks"""
+
+    def __init__(self, tick_rate=TICK_RATE, max_ticks_per_frame=MAX_TICKS_PER_FRAME):
+        self.tick_rate = tick_rate
+        self.tick_delta = 1 / tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+
+        # Game time per real time, above 1 fast forwards (replays)
+        self.speed = 1.0
+
+        # Time that has passed but not been simulated yet
+        self.accumulator = 0
+
+        # Counters for monitoring
+        self.ticks = 0
+        self.dropped_ticks = 0
+
+    def advance(self, delta_time):
+        """Add a frame's time, returns how many ticks to run for it"""
+        self.accumulator += delta_time * self.speed
+        ticks = int(self.accumulator / self.tick_delta)
+        self.accumulator -= ticks * self.tick_delta
+
+        max_ticks = self.max_ticks_per_frame * max(1, math.ceil(self.speed))
+        if ticks > max_ticks:
+            self.dropped_ticks += ticks - max_ticks
+            ticks = max_ticks
+
+        self.ticks += ticks
+        return ticks
+
+    @property
+    def alpha(self):
+        """How far between the last tick and the next one the current frame is, 0 to 1"""
+        return min(self.accumulator / self.tick_delta, 1.0)
+
+    def reset(self):
+        self.accumulator = 0
+
+
+def lerp(start, end, alpha):
+    return start + (end - start) * alpha
+
+
+class Interpolator:
+    """
+    Draws moving sprites part of the way between where they were before the
+    last tick and where they are now.
+    capture() is called before the tick, apply() before drawing and restore()
+    right after, so the game logic only ever sees the real positions.
+    """
+
+    def __init__(self, snap_distance=SNAP_DISTANCE):
+        self.snap_distance = snap_distance
+
+        # (sprite, position before the last tick)
+        self.previous = []
+
+        # (sprite, real position) of the sprites apply() moved
+        self.moved = []
+
+    def capture(self, sprites):
+        self.previous = [(sprite, sprite.position) for sprite in sprites]
+
+    def apply(self, alpha):
+        for sprite, (previous_x, previous_y) in self.previous:
+            x, y = position = sprite.position
+            if x == previous_x and y == previous_y:
+                continue
+            if abs(x - previous_x) > self.snap_distance or abs(y - previous_y) > self.snap_distance:
+                continue
+            self.moved.append((sprite, position))
+            sprite.position = (lerp(previous_x, x, alpha), lerp(previous_y, y, alpha))
+
+    def restore(self):
+        for sprite, position in self.moved:
+            sprite.position = position
+        self.moved = []
+
+    def clear(self):
+        self.previous = []
+        self.moved = []
@@ -0,0 +1,102 @@
+import time
+from collections import deque
+
+# Number of frames the rolling averages cover
+WINDOW_SIZE = 120
+
+
+def percentile(samples, fraction):
+    """Value below which the given fraction (0 to 1) of the samples fall"""
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(int(fraction * len(ordered)), len(ordered) - 1)
+    return ordered[index]
+
+
+class PhaseTimer:
+    """Context manager that adds the time spent inside it to one phase"""
+
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class FrameStats:
+    """
+    Rolling per-phase timings (update, draw, hud, ...) over the last
+    WINDOW_SIZE samples of each phase, plus free-form counters.
+
+        with self.frame_stats.measure("hud"):
+            self.hud.draw()
+    """
+
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+
+        # phase -> recent durations, in seconds
+        self.samples = {}
+
+        # name -> latest value, for things like how often the HUD re-laid out
+        self.counters = {}
+
+        # When the current lap started, see start_laps()
+        self.lap_start = 0
+
+    def measure(self, phase):
+        return PhaseTimer(self, phase)
+
+    def start_laps(self):
+        """
+        Time a run of phases back to back, cheaper than a measure() block each:
+
+            self.frame_stats.start_laps()
+            ...
+            self.frame_stats.lap("enemies")
+            ...
+            self.frame_stats.lap("physics")
+        """
+        self.lap_start = time.perf_counter()
+
+    def lap(self, phase):
+        """Record the time since the last lap (or start_laps) under a phase"""
+        now = time.perf_counter()
+        self.record(phase, now - self.lap_start)
+        self.lap_start = now
+
+    def record(self, phase, seconds):
+        samples = self.samples.get(phase)
+        if samples is None:
+            samples = self.samples[phase] = deque(maxlen=self.window_size)
+        samples.append(seconds)
+
+    def set_counter(self, name, value):
+        self.counters[name] = value
+
+    def mean_ms(self, phase):
+        samples = self.samples.get(phase)
+        if not samples:
+            return 0
+        return sum(samples) / len(samples) * 1000
+
+    def max_ms(self, phase):
+        samples = self.samples.get(phase)
+        if not samples:
+            return 0
+        return max(samples) * 1000
+
+    def summary(self):
+        """Mean and worst time of every phase in milliseconds, plus the counters"""
+        summary = {phase: {'mean_ms': self.mean_ms(phase), 'max_ms': self.max_ms(phase)}
+                   for phase in self.samples}
+        summary.update(self.counters)
+        return summary
@@ -0,0 +1,96 @@
+"""
+Headless simulation of the game.
+
+Runs the same setup/setup_part_2/tick logic as the real game, but with
+no window, no rendering and no audio, so levels can be stepped as fast as the
+logic allows. Used for benchmarking level logic and for soak tests on
+machines with no display or GPU.
+
+    python headless.py --stage 1-2 --ticks 20000 --autopilot
+"""
+
+import argparse
+import time
+
+import arcade
+
+import super_mario as main
+
+# Autopilot presses jump this often, in ticks
+AUTOPILOT_JUMP_TICKS = 45
+
+
+class HeadlessRunner:
+    """
+    Owns a headless Game and steps it from a script.
+    """
+
+    def __init__(self, stage="1-1", skip_intro=True):
+        self.game = main.Game()
+
+        # Start from the requested stage rather than the save file
+        self.game.stage = stage
+        self.game.stage_num = self.game.stages.index(stage)
+        self.game.mario_world = stage
+
+        self.skip_intro = skip_intro
+        self.ticks = 0
+
+        self.game.setup()
+        if self.skip_intro:
+            self.finish_intro()
+
+    def finish_intro(self):
+        # Same as the last tick of the stage intro
+        self.game.stage_intro = False
+        self.game.setup_part_2()
+
+    def press(self, key):
+        self.game.on_key_press(key, 0)
+
+    def release(self, key):
+        self.game.on_key_release(key, 0)
+
+    def step(self, ticks=1):
+        """Run the game logic for a number of ticks"""
+        # Ticks are run directly rather than through on_update, so a run
+        # doesn't depend on how long each tick takes here
+        for _ in range(ticks):
+            self.game.tick()
+            self.ticks += 1
+
+    def autopilot_step(self):
+        """Run one tick while running right and jumping every so often"""
+        if not self.game.stage_intro and not self.game.is_defeated:
+            if not self.game.right_key_down:
+                self.press(arcade.key.D)
+                self.press(arcade.key.J)
+            if self.ticks % AUTOPILOT_JUMP_TICKS == 0:
+                self.press(arcade.key.W)
+        self.step()
+
+
+def main_headless():
+    parser = argparse.ArgumentParser(description="Run the game logic without a window")
+    parser.add_argument("--stage", default="1-1", help="world to start in, such as 1-1")
+    parser.add_argument("--ticks", type=int, default=10000, help="number of ticks to simulate")
+    parser.add_argument("--autopilot", action="store_true", help="run right and jump instead of standing still")
+    args = parser.parse_args()
+
+    runner = HeadlessRunner(args.stage)
+
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        if args.autopilot:
+            runner.autopilot_step()
+        else:
+            runner.step()
+    elapsed = time.perf_counter() - start
+
+    game = runner.game
+    print(f"{runner.ticks} ticks in {elapsed:.2f}s ({runner.ticks / elapsed:.0f} ticks/s)")
+    print(f"world {game.mario_world}, score {game.score}, coins {game.coin_count}, lives {game.lives}")
+
+
+if __name__ == "__main__":
+    main_headless()
@@ -0,0 +1,71 @@
+import arcade
+
+FONT_NAME = "Kenney Pixel"
+
+# Font size of the floating "+100" style score popups
+POPUP_FONT_SIZE = 20
+
+
+def format_status(score, coin_count, world, timer=None):
+    """The two line MARIO / COINS / WORLD / TIME read out"""
+    status = f"MARIO \t\t COINS \t\t WORLD \t\t TIME \n{score:06d}  \t\t {coin_count:02d} \t\t\t   {world}"
+    if timer is not None:
+        status += f" \t\t {timer:03d}"
+    return status
+
+
+class Hud:
+    """
+    Heads up display built from arcade.Text objects that are kept between
+    frames. Laying text out is the slow part, so each text is only rebuilt
+    when one of the values shown in it changes; drawing an unchanged text
+    just reuses the geometry from last time.
+    The status line and intro text are placed in screen space, so draw them
+    with a camera that doesn't scroll.
+    """
+
+    def __init__(self, screen_width, screen_height, font_size):
+        self.status = arcade.Text("", screen_width / 10, screen_height - 2 * font_size,
+                                  arcade.color.WHITE, font_size,
+                                  multiline=True, width=screen_width, align="left", font_name=FONT_NAME)
+
+        self.intro = arcade.Text("", 0, screen_height / 2 + 3 * font_size,
+                                 arcade.color.WHITE, font_size * 1.5,
+                                 multiline=True, width=screen_width, align="center", font_name=FONT_NAME)
+
+        self.popup = arcade.Text("", 0, 0, arcade.color.WHITE, POPUP_FONT_SIZE,
+                                 width=screen_width, align="center", font_name=FONT_NAME)
+
+        # What each text currently shows, so changes can be spotted without
+        # building the string
+        self.status_values = None
+        self.intro_values = None
+        self.popup_value = None
+
+        # Number of times a text had to be laid out again, for frame stats
+        self.relayouts = 0
+
+    def draw_status(self, score, coin_count, world, timer=None):
+        values = (score, coin_count, world, timer)
+        if values != self.status_values:
+            self.status_values = values
+            self.status.text = format_status(*values)
+            self.relayouts += 1
+        self.status.draw()
+
+    def draw_intro(self, world, lives):
+        values = (world, lives)
+        if values != self.intro_values:
+            self.intro_values = values
+            self.intro.text = f"WORLD  {world}\n\n\t\t{lives}"
+            self.relayouts += 1
+        self.intro.draw()
+
+    def draw_popup(self, value, x, y):
+        """Score popup, in world space next to Mario. Moving it doesn't need a new layout."""
+        if value != self.popup_value:
+            self.popup_value = value
+            self.popup.text = str(value)
+            self.relayouts += 1
+        self.popup.position = (x, y)
+        self.popup.draw()
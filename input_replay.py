@@ -0,0 +1,268 @@
+"""
+Record the keys pressed during a play-through and play them back later.
+
+The game logic only changes on ticks and only reacts to key presses, so a
+recording is the starting save data plus every key press/release tagged
+with the tick it arrived before. Playing that back into a fresh game gives
+the same play-through, in a window at any speed or headless as fast as it
+can go. Every CHECKPOINT_TICKS ticks a checksum of the game state is stored
+too, so a replay that goes differently is caught at the checkpoint where it
+first went wrong.
+
+    python input_replay.py record run.mrp
+    python input_replay.py replay run.mrp --speed 4
+    python input_replay.py replay run.mrp --headless
+"""
+
+import argparse
+import struct
+import time
+import zlib
+
+import arcade
+
+import super_mario as main
+from fixed_timestep import TICK_RATE
+from frame_stats import percentile
+
+MAGIC = b"MRPL"
+RECORDING_VERSION = 1
+
+# magic, version, tick rate, stage, lives, score, coins, ticks, events, checkpoints
+HEADER = struct.Struct("<4sHH8sIIIIII")
+# tick, key, pressed
+EVENT = struct.Struct("<IIB")
+# tick, state checksum
+CHECKPOINT = struct.Struct("<II")
+
+# How often the game state is checksummed, in ticks
+CHECKPOINT_TICKS = 60
+
+
+def get_state_checksum(game):
+    """crc32 of the parts of the game state a desync would show up in"""
+    if game.mario is None:
+        mario_x = mario_y = 0
+    else:
+        mario_x, mario_y = game.mario.position
+    state = struct.pack("<ddIIiI8s", mario_x, mario_y, game.score, game.coin_count,
+                        game.lives, game.timer, game.mario_world.encode())
+    return zlib.crc32(state)
+
+
+class Recording:
+    """Where a play-through started and every key pressed during it"""
+
+    def __init__(self, tick_rate, stage, lives, score, coin_count):
+        self.tick_rate = tick_rate
+        self.stage = stage
+        self.lives = lives
+        self.score = score
+        self.coin_count = coin_count
+
+        # Number of ticks the play-through lasted
+        self.ticks = 0
+
+        # (tick, key, pressed), in order
+        self.events = []
+
+        # (tick, state checksum), in order
+        self.checkpoints = []
+
+    @classmethod
+    def from_game(cls, game):
+        return cls(game.timestep.tick_rate, game.stage, game.lives, game.score, game.coin_count)
+
+    def start_game(self, game):
+        """Put a new game, before its setup(), in the recorded starting state"""
+        game.stage = self.stage
+        game.stage_num = game.stages.index(self.stage)
+        game.mario_world = self.stage
+        game.lives = self.lives
+        game.score = self.score
+        game.coin_count = self.coin_count
+
+    def save(self, path):
+        header = HEADER.pack(MAGIC, RECORDING_VERSION, self.tick_rate, self.stage.encode(),
+                             self.lives, self.score, self.coin_count, self.ticks,
+                             len(self.events), len(self.checkpoints))
+        with open(path, "wb") as recording_file:
+            recording_file.write(header)
+            for tick, key, pressed in self.events:
+                recording_file.write(EVENT.pack(tick, key, pressed))
+            for checkpoint in self.checkpoints:
+                recording_file.write(CHECKPOINT.pack(*checkpoint))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as recording_file:
+            data = recording_file.read()
+
+        (magic, version, tick_rate, stage, lives, score, coin_count,
+         ticks, event_count, checkpoint_count) = HEADER.unpack_from(data)
+        if magic != MAGIC or version != RECORDING_VERSION:
+            raise ValueError(f"{path} is not a version {RECORDING_VERSION} recording")
+        if tick_rate != TICK_RATE:
+            raise ValueError(f"{path} was recorded at {tick_rate} ticks/s, the game runs at {TICK_RATE}")
+
+        recording = cls(tick_rate, stage.rstrip(b"\0").decode(), lives, score, coin_count)
+        recording.ticks = ticks
+
+        offset = HEADER.size
+        events_end = offset + event_count * EVENT.size
+        recording.events = [(tick, key, bool(pressed))
+                            for tick, key, pressed in EVENT.iter_unpack(data[offset:events_end])]
+        checkpoints_end = events_end + checkpoint_count * CHECKPOINT.size
+        recording.checkpoints = list(CHECKPOINT.iter_unpack(data[events_end:checkpoints_end]))
+        return recording
+
+
+class InputRecorder:
+    """
+    Attach to a game before its setup() with game.input_recorder = InputRecorder(game).
+    The level loader is switched to loading on the game thread, because a
+    world that finished loading a tick later would make the replay differ.
+    """
+
+    def __init__(self, game):
+        self.recording = Recording.from_game(game)
+        game.level_cache.background = False
+
+    def record(self, tick, key, pressed):
+        self.recording.events.append((tick, key, pressed))
+
+    def checkpoint(self, game):
+        """Called at the start of every tick"""
+        self.recording.ticks = game.tick_count + 1
+        if game.tick_count % CHECKPOINT_TICKS == 0:
+            self.recording.checkpoints.append((game.tick_count, get_state_checksum(game)))
+
+    def save(self, path):
+        self.recording.save(path)
+
+
+class InputReplayer:
+    """
+    Feeds a recording's key presses to a game on the ticks they were made.
+    Set game.input_replayer before the game's setup(), the keyboard is
+    ignored while it is set.
+    """
+
+    def __init__(self, recording):
+        self.recording = recording
+        self.next_event = 0
+        self.next_checkpoint = 0
+
+        # Tick of the first checkpoint that didn't match, None while in sync
+        self.desync_tick = None
+
+    def replay_tick(self, game):
+        """Called at the start of every tick"""
+        tick = game.tick_count
+
+        # Keys pressed since the last tick, which the recorder saw before
+        # its checkpoint for this tick
+        events = self.recording.events
+        while self.next_event < len(events) and events[self.next_event][0] <= tick:
+            _, key, pressed = events[self.next_event]
+            self.next_event += 1
+            if pressed:
+                game.handle_key_press(key)
+            else:
+                game.handle_key_release(key)
+
+        checkpoints = self.recording.checkpoints
+        while self.next_checkpoint < len(checkpoints) and checkpoints[self.next_checkpoint][0] <= tick:
+            checkpoint_tick, checksum = checkpoints[self.next_checkpoint]
+            self.next_checkpoint += 1
+            if self.desync_tick is None and (checkpoint_tick != tick or checksum != get_state_checksum(game)):
+                self.desync_tick = checkpoint_tick
+
+
+def create_game(recording, headless=False):
+    if headless:
+        game = main.Game()
+    else:
+        game = main.MyGame().game
+    # The recording was made with the world loaded on the game thread
+    game.level_cache.background = False
+    recording.start_game(game)
+    game.input_replayer = InputReplayer(recording)
+    game.setup()
+    return game
+
+
+def replay_headless(recording):
+    """Run a recording as fast as possible, returns the game and each tick's time in seconds"""
+    game = create_game(recording, headless=True)
+    tick_times = []
+    for _ in range(recording.ticks):
+        start = time.perf_counter()
+        game.tick()
+        tick_times.append(time.perf_counter() - start)
+    return game, tick_times
+
+
+def replay_window(recording, speed=1.0):
+    """Watch a recording, speed 2 plays it twice as fast"""
+    game = create_game(recording)
+    game.timestep.speed = speed
+
+    def check_finished(delta_time):
+        if game.tick_count >= recording.ticks:
+            arcade.exit()
+
+    arcade.schedule(check_finished, 0.25)
+    arcade.run()
+    return game
+
+
+def record(path):
+    """Play the game normally, the recording is written when the window closes"""
+    game = main.MyGame().game
+    recorder = InputRecorder(game)
+    game.input_recorder = recorder
+    game.setup()
+    arcade.run()
+    recorder.save(path)
+    recording = recorder.recording
+    print(f"recorded {recording.ticks} ticks and {len(recording.events)} key events to {path}")
+
+
+def main_replay():
+    parser = argparse.ArgumentParser(description="Record a play-through, or play one back")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="play and record the keys pressed")
+    record_parser.add_argument("path")
+
+    replay_parser = subparsers.add_parser("replay", help="play a recording back")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="playback speed in a window")
+    replay_parser.add_argument("--headless", action="store_true", help="no window, as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.path)
+        return
+
+    recording = Recording.load(args.path)
+    if args.headless:
+        game, tick_times = replay_headless(recording)
+        print(f"{len(tick_times)} ticks in {sum(tick_times):.2f}s, tick time "
+              f"p50 {percentile(tick_times, 0.5) * 1000:.3f}ms "
+              f"p99 {percentile(tick_times, 0.99) * 1000:.3f}ms "
+              f"max {max(tick_times, default=0) * 1000:.3f}ms")
+    else:
+        game = replay_window(recording, args.speed)
+
+    print(f"world {game.mario_world}, score {game.score}, coins {game.coin_count}, lives {game.lives}")
+    desync_tick = game.input_replayer.desync_tick
+    if desync_tick is None:
+        print("replay matched the recording")
+    else:
+        print(f"replay went differently from the recording at tick {desync_tick}")
+
+
+if __name__ == "__main__":
+    main_replay()
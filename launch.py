@@ -1,7 +1,8 @@
 import arcade 
 import super_mario as main
 import arcade.gui
-import json
+from save_manager import saves
+from hud import Hud
 
 SCREEN_TITLE = "Launch"
 
@@ -73,17 +74,16 @@ class Title_Screen(arcade.View):
         )
 
         # Put saved stuff here
-        save_name = "1"
-        self.save_path = f"resources/save_data/save_{save_name}.json"
-        save_file = open(self.save_path)
-        save_data = json.load(save_file)
+        self.save_slot = "1"
+        save_data = saves.load(self.save_slot)
         
         self.score = save_data['score']
         self.coin_count = save_data['coin_count']
         self.lives = save_data['lives']
         self.stage = save_data['stage']
-        
-        save_file.close()
+
+        # Score read out, laid out once and reused every frame
+        self.hud = Hud(main.SCREEN_WIDTH, main.SCREEN_HEIGHT, main.DEFAULT_FONT_SIZE)
 
 
     def on_draw(self):
@@ -92,17 +92,7 @@ class Title_Screen(arcade.View):
         #self.clear()
         arcade.draw_lrwh_rectangle_textured(0, 0, main.SCREEN_WIDTH, main.SCREEN_HEIGHT, self.background)
         
-        draw_string = f"MARIO \t\t COINS \t\t WORLD \t\t TIME \n{self.score:06d}  \t\t {self.coin_count:02d} \t\t\t   {self.stage}"
-
-        arcade.draw_text(draw_string,
-                         main.SCREEN_WIDTH / 10,
-                         main.SCREEN_HEIGHT - 2 * main.DEFAULT_FONT_SIZE,
-                         arcade.color.WHITE,
-                         main.DEFAULT_FONT_SIZE,
-                         multiline = True,
-                         width=main.SCREEN_WIDTH,
-                         align="left",
-                         font_name="Kenney Pixel")
+        self.hud.draw_status(self.score, self.coin_count, self.stage)
         
         # manager
         self.manager.draw()
@@ -0,0 +1,526 @@
+"""
+Compiled level bundles.
+
+A bundle is a binary copy of a Tiled map that has already been through
+arcade's tile map loader: every tile layer is stored as a flat array of
+tile ids, the object layers as fixed size records, and the hit box of every
+tile is worked out ahead of time. Loading a bundle memory-maps the file and
+builds the sprite lists straight from it, so no XML is parsed and no hit
+boxes are traced from images.
+
+Compile every world ahead of time with:
+
+    python level_bundle.py
+
+Bundles that are out of date (an old format version, a changed map,
+tileset or image, or different hit box settings) are ignored and rebuilt by
+the level cache the next time the map is loaded.
+"""
+import arcade
+import array
+import json
+import math
+import mmap
+import os
+import pytiled_parser
+import re
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+
+# arcade's own helpers for finding the image behind a tile. They are not
+# part of arcade's public API, which is why the README pins the arcade version.
+from arcade.tilemap.tilemap import _get_image_info_from_tileset, _get_image_source
+
+BUNDLE_MAGIC = b"MLVL"
+
+# Bump this whenever the layout below changes, older bundles are then rebuilt
+BUNDLE_VERSION = 1
+
+BUNDLE_EXTENSION = ".lvl"
+
+# magic, version, flags (unused), length of the JSON block that follows
+HEADER = struct.Struct("<4sHHI")
+
+# One tile object: gid, x, y, width, height, rotation, all in map pixels
+OBJECT_RECORD = struct.Struct("<I5d")
+
+# Tile ids are stored as little endian unsigned ints, 16 bit when every id
+# in the layer fits (no flip flags), 32 bit otherwise
+SMALL_TILE_ID = "H"
+LARGE_TILE_ID = "I"
+
+# Every array starts on a 4 byte boundary so it can be cast in place
+DATA_ALIGNMENT = 4
+
+# Same hit box default as arcade.load_tilemap
+DEFAULT_HIT_BOX_ALGORITHM = "Simple"
+
+# Files referenced from a map or tileset
+SOURCE_PATTERN = re.compile(rb'source="([^"]+)"')
+
+
+def get_bundle_name(map_name):
+    """Where the bundle for a map file lives, right next to it"""
+    return os.path.splitext(map_name)[0] + BUNDLE_EXTENSION
+
+
+def get_source_files(map_name):
+    """The map file plus every tileset and image it pulls in, in a stable order"""
+    found = []
+    pending = [os.path.normpath(map_name)]
+    while pending:
+        file_name = pending.pop(0)
+        if file_name in found:
+            continue
+        found.append(file_name)
+        if file_name.endswith((".tmx", ".tsx")):
+            with open(file_name, "rb") as source:
+                for match in SOURCE_PATTERN.findall(source.read()):
+                    path = os.path.join(os.path.dirname(file_name), match.decode())
+                    pending.append(os.path.normpath(path))
+    return found
+
+
+def get_checksums(map_name, bundle_dir):
+    """crc32 of every source file, keyed by its path relative to the bundle"""
+    checksums = {}
+    for file_name in get_source_files(map_name):
+        with open(file_name, "rb") as source:
+            checksums[os.path.relpath(file_name, bundle_dir)] = zlib.crc32(source.read())
+    return checksums
+
+
+def get_hit_box_algorithms(layer_names, layer_options):
+    """The hit box algorithm each layer is built with"""
+    algorithms = {}
+    for name in layer_names:
+        options = (layer_options or {}).get(name, {})
+        algorithms[name] = options.get("hit_box_algorithm", DEFAULT_HIT_BOX_ALGORITHM)
+    return algorithms
+
+
+def _describe_tile(tile_map, tile, sprite, bundle_dir):
+    """Everything needed to rebuild the sprite for one tile id"""
+    map_directory = os.path.dirname(tile_map.tiled_map.map_file)
+    image_file = _get_image_source(tile, map_directory)
+
+    info = {
+        "image": os.path.relpath(image_file, bundle_dir),
+        "region": None,
+        "flipped": [tile.flipped_horizontally, tile.flipped_vertically, tile.flipped_diagonally],
+        "hit_box": [list(point) for point in sprite.hit_box],
+        "properties": dict(tile.properties or {}),
+        "type": tile.class_,
+        "tile_id": tile.id,
+        "animation": None,
+    }
+
+    if tile.animation:
+        frames = []
+        for frame in tile.animation:
+            frame_tile = tile_map._get_tile_by_id(tile.tileset, frame.tile_id)
+            frame_image = _get_image_source(frame_tile, map_directory)
+            region = None if frame_tile.image else list(_get_image_info_from_tileset(frame_tile))
+            frames.append([os.path.relpath(frame_image, bundle_dir), region, frame.duration, frame.tile_id])
+        info["animation"] = frames
+    else:
+        info["region"] = list(_get_image_info_from_tileset(tile))
+
+    return info
+
+
+def compile_tilemap(tile_map, map_name, layer_options=None):
+    """
+    Turn a TileMap that arcade has just loaded into bundle bytes.
+    The sprites arcade built are walked alongside the map data, so the
+    stored hit boxes are exactly the ones arcade came up with.
+    """
+    bundle_dir = os.path.dirname(os.path.abspath(map_name))
+    tiled_map = tile_map.tiled_map
+    layer_names = [layer.name for layer in tiled_map.layers]
+
+    meta = {
+        "checksums": get_checksums(map_name, bundle_dir),
+        "hit_box_algorithms": get_hit_box_algorithms(layer_names, layer_options),
+        "width": tile_map.width,
+        "height": tile_map.height,
+        "tile_width": tile_map.tile_width,
+        "tile_height": tile_map.tile_height,
+        "layers": [],
+    }
+    data = bytearray()
+
+    for layer in tiled_map.layers:
+        entry = {
+            "name": layer.name,
+            "visible": layer.visible,
+            "opacity": layer.opacity,
+            "tint": list(layer.tint_color) if layer.tint_color else None,
+            "properties": layer.properties,
+        }
+        sprites = iter(tile_map.sprite_lists.get(layer.name, []))
+        tiles = {}
+
+        if isinstance(layer, pytiled_parser.TileLayer):
+            gids = array.array(LARGE_TILE_ID, [gid for row in layer.data for gid in row])
+            for gid in gids:
+                if gid == 0:
+                    continue
+                sprite = next(sprites)
+                if str(gid) not in tiles:
+                    tiles[str(gid)] = _describe_tile(tile_map, tile_map._get_tile_by_gid(gid), sprite, bundle_dir)
+            if max(gids, default=0) < 1 << 16:
+                gids = array.array(SMALL_TILE_ID, gids)
+            if sys.byteorder != "little":
+                gids.byteswap()
+            entry.update(kind="tiles", columns=len(layer.data[0]) if layer.data else 0,
+                         rows=len(layer.data), typecode=gids.typecode, offset=len(data), tiles=tiles)
+            data += gids.tobytes()
+            data += bytes(-len(data) % DATA_ALIGNMENT)
+
+        elif isinstance(layer, pytiled_parser.ObjectLayer):
+            objects = []
+            records = bytearray()
+            for cur_object in layer.tiled_objects:
+                if not isinstance(cur_object, pytiled_parser.tiled_object.Tile):
+                    continue
+                sprite = next(sprites)
+                gid = cur_object.gid
+                if str(gid) not in tiles:
+                    tiles[str(gid)] = _describe_tile(tile_map, tile_map._get_tile_by_gid(gid), sprite, bundle_dir)
+                records += OBJECT_RECORD.pack(gid, cur_object.coordinates.x, cur_object.coordinates.y,
+                                              cur_object.size[0], cur_object.size[1], cur_object.rotation or 0)
+                objects.append({
+                    "properties": dict(cur_object.properties or {}),
+                    "type": cur_object.class_,
+                    "name": cur_object.name,
+                })
+            shapes = [[tiled_object.shape, tiled_object.properties, tiled_object.name, tiled_object.type]
+                      for tiled_object in tile_map.object_lists.get(layer.name, [])]
+            entry.update(kind="objects", offset=len(data), objects=objects, tiles=tiles, shapes=shapes)
+            data += records
+
+        elif isinstance(layer, pytiled_parser.ImageLayer):
+            sprite = next(sprites)
+            image_file = os.path.join(os.path.dirname(tiled_map.map_file), layer.image)
+            entry.update(kind="image", image=os.path.relpath(image_file, bundle_dir),
+                         offset=list(layer.offset), hit_box=[list(point) for point in sprite.hit_box])
+
+        else:
+            # Layer groups are not used by any of the worlds
+            continue
+
+        meta["layers"].append(entry)
+
+    meta_bytes = json.dumps(meta, separators=(",", ":")).encode()
+    meta_bytes += b" " * (-(HEADER.size + len(meta_bytes)) % DATA_ALIGNMENT)
+
+    return HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(meta_bytes)) + meta_bytes + bytes(data)
+
+
+def write_bundle(tile_map, map_name, layer_options=None):
+    """Compile a loaded map and write it next to the map file"""
+    bundle_name = get_bundle_name(map_name)
+    temp_name = bundle_name + ".tmp"
+    with open(temp_name, "wb") as bundle_file:
+        bundle_file.write(compile_tilemap(tile_map, map_name, layer_options))
+    # Swap it in in one go, so a half written bundle is never read
+    os.replace(temp_name, bundle_name)
+    return bundle_name
+
+
+class BundleTileMap:
+    """
+    The parts of arcade.TileMap the game uses, filled in from a bundle:
+    sprite lists and object lists by layer name, plus the map size.
+    """
+
+    def __init__(self, bundle, scaling):
+        self.width = bundle.meta["width"]
+        self.height = bundle.meta["height"]
+        self.tile_width = bundle.meta["tile_width"]
+        self.tile_height = bundle.meta["tile_height"]
+        self.scaling = scaling
+        self.background_color = None
+        self.properties = None
+
+        self.sprite_lists = OrderedDict()
+        self.object_lists = OrderedDict()
+
+
+class LevelBundle:
+    """
+    A memory-mapped bundle file.
+    Stays open so the level can be rebuilt from it again on a respawn.
+    """
+
+    def __init__(self, bundle_name):
+        self.bundle_name = bundle_name
+        self.bundle_dir = os.path.dirname(os.path.abspath(bundle_name))
+
+        with open(bundle_name, "rb") as bundle_file:
+            self.data = mmap.mmap(bundle_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Textures of plain tiles, shared by every sprite using the same tile
+        self.textures = {}
+
+        self.meta = None
+        try:
+            self._read_header()
+        except Exception:
+            # Let go of the file, so the bundle can be written again
+            self.close()
+            raise
+
+    def _read_header(self):
+        magic, self.version, _flags, meta_length = HEADER.unpack_from(self.data)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{self.bundle_name} is not a level bundle")
+
+        self.data_start = HEADER.size + meta_length
+        if self.version == BUNDLE_VERSION:
+            self.meta = json.loads(self.data[HEADER.size:self.data_start])
+            # Hit boxes are handed to sprites as is, make them tuples once up front
+            for layer in self.meta["layers"]:
+                for info in layer.get("tiles", {}).values():
+                    info["hit_box"] = tuple(tuple(point) for point in info["hit_box"])
+
+    def close(self):
+        """
+        Unmap the file. Windows won't replace a file that is still mapped,
+        so a stale bundle has to be closed before it is rebuilt.
+        """
+        self.data.close()
+
+    def is_stale(self, map_name, layer_options):
+        """True if the bundle no longer matches the map it was built from"""
+        if self.meta is None:
+            return True
+        layer_names = [layer["name"] for layer in self.meta["layers"]]
+        if self.meta["hit_box_algorithms"] != get_hit_box_algorithms(layer_names, layer_options):
+            return True
+        try:
+            return self.meta["checksums"] != get_checksums(map_name, self.bundle_dir)
+        except OSError:
+            return True
+
+    def _path(self, relative_path):
+        return os.path.abspath(os.path.join(self.bundle_dir, relative_path))
+
+    def _get_tile_ids(self, layer):
+        """The tile ids of a tile layer, read straight out of the mapped file"""
+        typecode = layer["typecode"]
+        start = self.data_start + layer["offset"]
+        end = start + layer["columns"] * layer["rows"] * array.array(typecode).itemsize
+        view = memoryview(self.data)[start:end]
+        if sys.byteorder == "little":
+            return view.cast(typecode)
+        gids = array.array(typecode, view)
+        gids.byteswap()
+        return gids
+
+    def _get_texture(self, info, image_file):
+        key = (image_file, *info["region"], *info["flipped"])
+        texture = self.textures.get(key)
+        if texture is None:
+            image_x, image_y, width, height = info["region"]
+            flipped_horizontally, flipped_vertically, flipped_diagonally = info["flipped"]
+            texture = arcade.load_texture(image_file, image_x, image_y, width, height,
+                                          flipped_horizontally=flipped_horizontally,
+                                          flipped_vertically=flipped_vertically,
+                                          flipped_diagonally=flipped_diagonally,
+                                          hit_box_algorithm="None")
+            self.textures[key] = texture
+        return texture
+
+    def _create_sprite(self, info, scaling, options):
+        """Same sprite arcade's _create_sprite_from_tile would make, minus the hit box tracing"""
+        custom_class = options.get("custom_class")
+        custom_class_args = options.get("custom_class_args", {})
+        image_file = self._path(info["image"])
+
+        if info["animation"]:
+            sprite = (custom_class or arcade.AnimatedTimeBasedSprite)(
+                **custom_class_args, filename=image_file, scale=scaling)
+        elif not custom_class:
+            # Plain tiles skip the per sprite texture lookup and share one texture
+            sprite = arcade.Sprite(texture=self._get_texture(info, image_file), scale=scaling)
+        else:
+            image_x, image_y, width, height = info["region"]
+            flipped_horizontally, flipped_vertically, flipped_diagonally = info["flipped"]
+            sprite = custom_class(
+                **custom_class_args,
+                filename=image_file,
+                scale=scaling,
+                image_x=image_x,
+                image_y=image_y,
+                image_width=width,
+                image_height=height,
+                flipped_horizontally=flipped_horizontally,
+                flipped_vertically=flipped_vertically,
+                flipped_diagonally=flipped_diagonally,
+                hit_box_algorithm="None",
+            )
+
+        sprite.properties.update(info["properties"])
+        if info["type"]:
+            sprite.properties["type"] = info["type"]
+        sprite.properties["tile_id"] = info["tile_id"]
+
+        sprite.hit_box = info["hit_box"]
+
+        if info["animation"]:
+            key_frames = []
+            for frame_image, region, duration, tile_id in info["animation"]:
+                if region:
+                    texture = arcade.load_texture(self._path(frame_image), *region)
+                else:
+                    texture = arcade.load_texture(self._path(frame_image))
+                key_frames.append(arcade.AnimationKeyframe(tile_id, duration, texture))
+            sprite.texture = key_frames[0].texture
+            sprite.frames = key_frames
+
+        return sprite
+
+    def _style_sprite(self, sprite, layer):
+        if layer["tint"]:
+            sprite.color = layer["tint"]
+        if layer["opacity"]:
+            sprite.alpha = int(layer["opacity"] * 255)
+
+    def _build_tile_layer(self, tile_map, layer, scaling, options, lazy):
+        sprite_list = arcade.SpriteList(use_spatial_hash=options.get("use_spatial_hash"), lazy=lazy)
+        columns = layer["columns"]
+        tile_width = tile_map.tile_width * scaling
+        tile_height = tile_map.tile_height * scaling
+
+        for index, gid in enumerate(self._get_tile_ids(layer)):
+            if gid == 0:
+                continue
+            row_index, column_index = divmod(index, columns)
+            sprite = self._create_sprite(layer["tiles"][str(gid)], scaling, options)
+            sprite.center_x = column_index * tile_width + sprite.width / 2
+            sprite.center_y = (tile_map.height - row_index - 1) * tile_height + sprite.height / 2
+            self._style_sprite(sprite, layer)
+            sprite_list.append(sprite)
+
+        sprite_list.visible = layer["visible"]
+        if layer["properties"]:
+            sprite_list.properties = layer["properties"]
+        tile_map.sprite_lists[layer["name"]] = sprite_list
+
+    def _build_object_layer(self, tile_map, layer, scaling, options, lazy):
+        if layer["objects"]:
+            sprite_list = arcade.SpriteList(use_spatial_hash=options.get("use_spatial_hash"), lazy=lazy)
+            map_height = tile_map.height * tile_map.tile_height
+            start = self.data_start + layer["offset"]
+            records = self.data[start:start + len(layer["objects"]) * OBJECT_RECORD.size]
+
+            for record, cur_object in zip(OBJECT_RECORD.iter_unpack(records), layer["objects"]):
+                gid, x, y, width, height, rotation = record
+                sprite = self._create_sprite(layer["tiles"][str(gid)], scaling, options)
+
+                sprite.width = width = width * scaling
+                sprite.height = height = height * scaling
+                angle_degrees = math.degrees(-math.radians(rotation)) if rotation else 0
+                rotated_center_x, rotated_center_y = arcade.rotate_point(width / 2, height / 2, 0, 0, angle_degrees)
+                sprite.position = (x * scaling + rotated_center_x, (map_height - y) * scaling + rotated_center_y)
+                sprite.angle = angle_degrees
+                self._style_sprite(sprite, layer)
+
+                # Movement settings come from the object's custom properties, as in arcade
+                properties = cur_object["properties"]
+                for key in ("change_x", "change_y", "boundary_bottom", "boundary_top",
+                            "boundary_left", "boundary_right"):
+                    if key in properties:
+                        setattr(sprite, key, float(properties[key]))
+                sprite.properties.update(properties)
+                if cur_object["type"]:
+                    sprite.properties["type"] = cur_object["type"]
+                if cur_object["name"]:
+                    sprite.properties["name"] = cur_object["name"]
+
+                sprite_list.append(sprite)
+
+            sprite_list.visible = layer["visible"]
+            tile_map.sprite_lists[layer["name"]] = sprite_list
+
+        if layer["shapes"]:
+            tile_map.object_lists[layer["name"]] = [arcade.TiledObject(*shape) for shape in layer["shapes"]]
+
+    def _build_image_layer(self, tile_map, layer, scaling, options, lazy):
+        sprite_list = arcade.SpriteList(use_spatial_hash=options.get("use_spatial_hash"), lazy=lazy)
+        image_file = self._path(layer["image"])
+        texture = arcade.load_texture(image_file, hit_box_algorithm="None")
+
+        custom_class = options.get("custom_class") or arcade.Sprite
+        sprite = custom_class(**options.get("custom_class_args", {}), filename=image_file, scale=scaling,
+                              texture=texture, hit_box_algorithm="None")
+        sprite.hit_box = layer["hit_box"]
+
+        if layer["properties"]:
+            sprite_list.properties = layer["properties"]
+            sprite.properties.update(layer["properties"])
+        self._style_sprite(sprite, layer)
+
+        sprite.center_x = layer["offset"][0] * scaling + sprite.width / 2
+        sprite.center_y = layer["offset"][1]
+
+        sprite_list.visible = layer["visible"]
+        sprite_list.append(sprite)
+        tile_map.sprite_lists[layer["name"]] = sprite_list
+
+    def create_tilemap(self, scaling, layer_options=None, skip_layers=(), lazy=False):
+        """
+        Build a fresh BundleTileMap, leaving out any layers named in skip_layers.
+        With lazy set the sprite lists make no OpenGL calls until they are
+        initialized, so this can run on a loader thread.
+        """
+        tile_map = BundleTileMap(self, scaling)
+        builders = {
+            "tiles": self._build_tile_layer,
+            "objects": self._build_object_layer,
+            "image": self._build_image_layer,
+        }
+        for layer in self.meta["layers"]:
+            if layer["name"] in skip_layers:
+                continue
+            options = (layer_options or {}).get(layer["name"], {})
+            builders[layer["kind"]](tile_map, layer, scaling, options, lazy)
+        return tile_map
+
+
+def load_bundle(map_name, layer_options=None):
+    """
+    Open the bundle for a map file.
+    Returns None if there is no bundle, or it is stale, so the caller can
+    fall back to the map file.
+    """
+    bundle_name = get_bundle_name(map_name)
+    if not os.path.exists(bundle_name):
+        return None
+    try:
+        bundle = LevelBundle(bundle_name)
+    except (OSError, ValueError, struct.error):
+        return None
+    if bundle.is_stale(map_name, layer_options):
+        bundle.close()
+        return None
+    return bundle
+
+
+def main():
+    """Compile the bundle for every world"""
+    import super_mario
+
+    for world in super_mario.STAGES:
+        map_name = super_mario.get_map_name(world)
+        tile_map = arcade.load_tilemap(map_name, super_mario.TILE_SCALING, super_mario.LAYER_OPTIONS)
+        bundle_name = write_bundle(tile_map, map_name, super_mario.LAYER_OPTIONS)
+        print(f"{map_name} -> {bundle_name} ({os.path.getsize(bundle_name)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
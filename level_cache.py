@@ -0,0 +1,213 @@
+import arcade
+import attr
+import concurrent.futures
+import level_bundle
+import time
+from collections import OrderedDict
+
+# Layers that never change while a level is played. Their sprite lists are
+# built once per world and handed back unchanged on every respawn.
+STATIC_LAYERS = ("Background", "Flag", "Flag_Bottom", "Next_Level_Door", "Platforms", "Teleport")
+
+
+class CachedLevel:
+    """
+    Pristine copy of one world: the parsed Tiled map or compiled bundle,
+    plus the sprite lists and objects of the layers that never change.
+    """
+
+    def __init__(self, tile_map, bundle=None):
+        self.bundle = bundle
+        self.scaling = tile_map.scaling
+
+        # Remember the original layer order so the scene draws the same way
+        self.layer_order = list(tile_map.sprite_lists) + list(tile_map.object_lists)
+
+        self.static_sprite_lists = {name: sprite_list for name, sprite_list in tile_map.sprite_lists.items()
+                                    if name in STATIC_LAYERS}
+        self.static_object_lists = {name: object_list for name, object_list in tile_map.object_lists.items()
+                                    if name in STATIC_LAYERS}
+
+        # Parsed map holding only the layers that gameplay changes.
+        # Not needed when the level came from a bundle, that can rebuild
+        # single layers by itself.
+        self.mutable_map = None
+        if bundle is None:
+            self.mutable_map = attr.evolve(tile_map.tiled_map,
+                                           layers=[layer for layer in tile_map.tiled_map.layers
+                                                   if layer.name not in STATIC_LAYERS])
+
+    def reset(self, layer_options, lazy=False):
+        """
+        Get a fresh TileMap for this world.
+        Only the coins, blocks, enemies and mushrooms are rebuilt, and they
+        come from the already parsed map or bundle rather than the file.
+        """
+        if self.bundle is not None:
+            tile_map = self.bundle.create_tilemap(self.scaling, layer_options, skip_layers=STATIC_LAYERS, lazy=lazy)
+        else:
+            tile_map = arcade.TileMap(scaling=self.scaling, layer_options=layer_options,
+                                      tiled_map=self.mutable_map)
+
+        # Splice the static layers back in, in their original order
+        sprite_lists = OrderedDict()
+        for name in self.layer_order:
+            if name in self.static_sprite_lists:
+                sprite_lists[name] = self.static_sprite_lists[name]
+            elif name in tile_map.sprite_lists:
+                sprite_lists[name] = tile_map.sprite_lists[name]
+        tile_map.sprite_lists = sprite_lists
+        tile_map.object_lists.update(self.static_object_lists)
+
+        return tile_map
+
+
+class LevelCache:
+    """
+    Keeps every world that has been loaded, so respawning or restarting a
+    level doesn't read and parse the map file again.
+    The first load of a world comes from its compiled bundle (see
+    level_bundle.py) when there is an up to date one, otherwise the map file
+    is parsed and a bundle is written for next time.
+
+    Worlds can be preloaded on a loader thread. Only worlds that come from a
+    bundle are built there, since their sprite lists can be made lazy and
+    so never touch OpenGL off the main thread. The caller uploads them to
+    the GPU once the TileMap is handed back. A world with no bundle yet has
+    to be parsed by arcade on the main thread, so its preload is put off
+    until the caller is at a point where the game can stall for it (see
+    run_deferred), or until load() needs it.
+
+    The loader thread only builds the TileMap. The cache and its counters
+    are only touched from the main thread, when load() collects the result.
+    """
+
+    def __init__(self, background=True):
+        # map file name -> CachedLevel
+        self.levels = {}
+
+        # Simulations turn this off, so a world is always ready on the same tick
+        self.background = background
+
+        # map file name -> (future, CachedLevel or None, bundle or None) for a
+        # preload that has not been collected yet
+        self.pending = {}
+        # map file name -> arguments of a preload waiting for run_deferred
+        self.deferred = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="level-loader")
+
+        # Counters so respawn cost can be measured
+        self.hits = 0
+        self.misses = 0
+        self.bundle_loads = 0
+        self.last_load_time = 0
+        # How long the main thread was held up collecting the last load
+        self.last_wait_time = 0
+
+    def preload(self, map_name, scaling, layer_options):
+        """
+        Start getting a world ready, and return a future that is done once it is.
+        Calling this again before the world is loaded hands back the same future.
+        """
+        pending = self.pending.get(map_name)
+        if pending is not None:
+            future, _cached, _bundle = pending
+            return future
+
+        cached = self.levels.get(map_name)
+        if cached is not None:
+            bundle = cached.bundle
+        else:
+            bundle = level_bundle.load_bundle(map_name, layer_options)
+
+        if not self.background:
+            future = concurrent.futures.Future()
+            future.set_result(self._build(map_name, scaling, layer_options, cached, bundle, False))
+        elif bundle is not None:
+            future = self.executor.submit(self._build, map_name, scaling, layer_options, cached, bundle, True)
+        else:
+            # arcade's own loader has to run on the main thread
+            future = concurrent.futures.Future()
+            self.deferred[map_name] = (future, scaling, layer_options, cached)
+
+        self.pending[map_name] = (future, cached, bundle)
+        return future
+
+    def run_deferred(self):
+        """Run the preloads that have to happen on the main thread, call when a stall won't be noticed"""
+        while self.deferred:
+            map_name, (future, scaling, layer_options, cached) = self.deferred.popitem()
+            future.set_result(self._build(map_name, scaling, layer_options, cached, None, False))
+
+    def is_ready(self, map_name):
+        """True unless a preload of this world is still running"""
+        pending = self.pending.get(map_name)
+        if pending is None:
+            return True
+        future, _cached, _bundle = pending
+        return future.done()
+
+    def load(self, map_name, scaling, layer_options):
+        """
+        Get a ready to play TileMap for a map file, waiting for its preload
+        if there is one. Its sprite lists may still need to be initialized.
+        """
+        start_time = time.perf_counter()
+
+        if map_name not in self.pending:
+            self.preload(map_name, scaling, layer_options)
+        future, cached, bundle = self.pending.pop(map_name)
+        self.run_deferred()
+        tile_map, new_bundle, load_time = future.result()
+
+        # The cache and counters are only ever changed here, on the main thread
+        if cached is None:
+            self.misses += 1
+            if bundle is not None:
+                self.bundle_loads += 1
+            self.levels[map_name] = CachedLevel(tile_map, new_bundle)
+        else:
+            self.hits += 1
+        self.last_load_time = load_time
+
+        self.last_wait_time = time.perf_counter() - start_time
+        return tile_map
+
+    def _build(self, map_name, scaling, layer_options, cached, bundle, lazy):
+        """
+        Build the TileMap, on whichever thread preload picked.
+        Returns it along with the bundle it can be rebuilt from and how long it took.
+        """
+        start_time = time.perf_counter()
+
+        if cached is not None:
+            tile_map = cached.reset(layer_options, lazy=lazy)
+        elif bundle is not None:
+            tile_map = bundle.create_tilemap(scaling, layer_options, lazy=lazy)
+        else:
+            tile_map = arcade.load_tilemap(map_name, scaling, layer_options)
+            try:
+                level_bundle.write_bundle(tile_map, map_name, layer_options)
+                # Respawns and later preloads can now use the bundle
+                bundle = level_bundle.load_bundle(map_name, layer_options)
+            except OSError as error:
+                # Read only install, keep going with the map file
+                print(f"Could not write level bundle for {map_name}: {error}")
+
+        return tile_map, bundle, time.perf_counter() - start_time
+
+    def close(self):
+        """Stop the loader thread, for when the game exits"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Hit/miss counters, how long the last load took and how long it was waited on, in milliseconds"""
+        loads = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bundle_loads': self.bundle_loads,
+            'hit_rate': self.hits / loads if loads else 0,
+            'last_load_ms': self.last_load_time * 1000,
+            'last_wait_ms': self.last_wait_time * 1000,
+        }
@@ -1,10 +1,10 @@
-import arcade
+from asset_registry import registry
 
-def load_texture_pair(filename):
+def load_texture_pair(filename, owner=None):
     """
     Load a texture pair, with the second being a mirror image.
     """
     return [
-        arcade.load_texture(filename),
-        arcade.load_texture(filename, flipped_horizontally=True),
+        registry.load_texture(filename, owner=owner),
+        registry.load_texture(filename, flipped_horizontally=True, owner=owner),
     ]
\ No newline at end of file
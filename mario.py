@@ -1,5 +1,6 @@
 import arcade
 from load_textures import load_texture_pair
+from asset_registry import registry
 import time
 
 # Constant used for the pixel height of a tile
@@ -64,44 +65,44 @@ class Mario(arcade.Sprite):
         main_path = "resources/sprites/"
 
         # Load textures for idle standing
-        self.small_idle_texture_pair = load_texture_pair(f"{main_path}mario_small_idle.png")
-        self.big_idle_texture_pair = load_texture_pair(f"{main_path}mario_big_idle.png")
+        self.small_idle_texture_pair = load_texture_pair(f"{main_path}mario_small_idle.png", owner=self)
+        self.big_idle_texture_pair = load_texture_pair(f"{main_path}mario_big_idle.png", owner=self)
 
         # Load textures for jumping
-        self.small_jump_texture_pair = load_texture_pair(f"{main_path}mario_small_jump.png")
-        self.big_jump_texture_pair = load_texture_pair(f"{main_path}mario_big_jump.png")
+        self.small_jump_texture_pair = load_texture_pair(f"{main_path}mario_small_jump.png", owner=self)
+        self.big_jump_texture_pair = load_texture_pair(f"{main_path}mario_big_jump.png", owner=self)
 
         # Load textures for sliding
-        self.small_slide_texture_pair = load_texture_pair(f"{main_path}mario_small_slide.png")
-        self.big_slide_texture_pair = load_texture_pair(f"{main_path}mario_big_slide.png")
+        self.small_slide_texture_pair = load_texture_pair(f"{main_path}mario_small_slide.png", owner=self)
+        self.big_slide_texture_pair = load_texture_pair(f"{main_path}mario_big_slide.png", owner=self)
 
         # Load textures for walking
         self.small_walk_textures = []
         for i in range(1, 4):
-            texture = load_texture_pair(f"{main_path}mario_small_walk_{i}.png")
+            texture = load_texture_pair(f"{main_path}mario_small_walk_{i}.png", owner=self)
             self.small_walk_textures.append(texture)
         self.big_walk_textures = []
         for i in range(1, 4):
-            texture = load_texture_pair(f"{main_path}mario_big_walk_{i}.png")
+            texture = load_texture_pair(f"{main_path}mario_big_walk_{i}.png", owner=self)
             self.big_walk_textures.append(texture)
 
         # Load textures for growing
         self.grow_textures = []
         self.grow_textures.append(self.small_idle_texture_pair[0])
-        self.grow_textures.append(arcade.load_texture(f"{main_path}mario_grow.png"))
+        self.grow_textures.append(registry.load_texture(f"{main_path}mario_grow.png", owner=self))
         self.grow_textures.append(self.small_idle_texture_pair[0])
-        self.grow_textures.append(arcade.load_texture(f"{main_path}mario_grow.png"))
+        self.grow_textures.append(registry.load_texture(f"{main_path}mario_grow.png", owner=self))
         self.grow_textures.append(self.small_idle_texture_pair[0])
-        self.grow_textures.append(arcade.load_texture(f"{main_path}mario_grow.png"))
+        self.grow_textures.append(registry.load_texture(f"{main_path}mario_grow.png", owner=self))
         self.grow_textures.append(self.big_idle_texture_pair[0])
         # Load textures from shrinking
         self.shrink_textures = []
         self.shrink_textures.append(self.big_idle_texture_pair[0])
-        self.shrink_textures.append(arcade.load_texture(f"{main_path}mario_shrink_1.png"))
+        self.shrink_textures.append(registry.load_texture(f"{main_path}mario_shrink_1.png", owner=self))
         self.shrink_textures.append(self.big_idle_texture_pair[0])
-        self.shrink_textures.append(arcade.load_texture(f"{main_path}mario_shrink_1.png"))
+        self.shrink_textures.append(registry.load_texture(f"{main_path}mario_shrink_1.png", owner=self))
         self.shrink_textures.append(self.small_idle_texture_pair[0])
-        self.shrink_textures.append(arcade.load_texture(f"{main_path}mario_shrink_2.png"))
+        self.shrink_textures.append(registry.load_texture(f"{main_path}mario_shrink_2.png", owner=self))
         self.shrink_textures.append(self.small_idle_texture_pair[0])
 
 
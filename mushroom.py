@@ -1,4 +1,6 @@
 import arcade
+from array import array
+from entity_store import EntityStore
 
 # Constant used for the pixel height of a tile
 TILE_HEIGHT = 16
@@ -40,42 +42,58 @@ class Mushroom(arcade.Sprite):
             center_y=center_y,
         )
 
-        self.is_hit = False
-        self.in_box = True
-
         self.scale = scale
-        
-        self.out_of_box_y = 0
-
-        self.update_counter = 0
 
         self.hit_box = self.texture.hit_box_points
 
-        self.direction = 1
+    def update(self):
+        """The physics moves mushrooms and MushroomStore.update steers them"""
 
-        self.prev_x = 0
 
-    def update(self):
-        if self.out_of_box_y == 0:
-            self.out_of_box_y = self.center_y + self.scale * TILE_HEIGHT
-            self.prev_x = self.center_x
-        if self.is_hit and self.in_box:
-            self.change_y = self.scale * TILE_HEIGHT / 16
-            if self.center_y >= self.out_of_box_y:
-                self.center_y = self.out_of_box_y
-                self.change_x = MUSHROOM_MOVEMENT_SPEED
-                self.in_box = False
-        elif not self.is_hit:
-            self.change_x = 0
-            self.change_y = 0
-        else:
-            if abs(self.center_x - self.prev_x) < 0.1:
-                self.direction = self.direction * -1
-            self.change_x = self.direction * MUSHROOM_MOVEMENT_SPEED
-            self.prev_x = self.center_x
-        
-        self.update_counter += 1
+class MushroomStore(EntityStore):
+    """
+    Every mushroom in a level. One sits hidden in its box until the box is
+    hit, rises out of it, then walks, turning around whenever it didn't
+    get anywhere since the last tick (it walked into a wall).
+    """
+
+    def __init__(self, sprite_lists):
+        super().__init__(sprite_lists)
+        self.is_hit = self.new_field('b', False)
+        self.in_box = self.new_field('b', True)
+        self.direction = self.new_field('b', 1)
+        self.prev_x = array('d', [sprite.center_x for sprite in self.sprites])
+        # Where the mushroom stops rising, a tile above where it starts
+        self.out_of_box_y = array('d', [sprite.center_y + sprite.scale * TILE_HEIGHT for sprite in self.sprites])
+
+    def release(self, sprite):
+        """The box the mushroom is in was hit. Returns False if it already was."""
+        entity_id = self.entity_ids[sprite]
+        if self.is_hit[entity_id]:
+            return False
+        self.is_hit[entity_id] = True
+        return True
+
+    def update(self, is_dormant=None):
+        """Steer every mushroom that is still in the level and awake"""
+        is_hit, in_box, direction, prev_x, out_of_box_y = (self.is_hit, self.in_box, self.direction,
+                                                          self.prev_x, self.out_of_box_y)
+        for entity_id, sprite in enumerate(self.sprites):
+            if not sprite.sprite_lists or (is_dormant is not None and is_dormant(sprite)):
+                continue
+            if not is_hit[entity_id]:
+                sprite.change_x = 0
+                sprite.change_y = 0
+                continue
 
-        # Reset counter to prevent overflow
-        if self.update_counter >= 1000:
-            self.update_counter = 0
\ No newline at end of file
+            if in_box[entity_id]:
+                sprite.change_y = sprite.scale * TILE_HEIGHT / 16
+                if sprite.center_y >= out_of_box_y[entity_id]:
+                    sprite.center_y = out_of_box_y[entity_id]
+                    sprite.change_x = MUSHROOM_MOVEMENT_SPEED
+                    in_box[entity_id] = False
+            else:
+                if abs(sprite.center_x - prev_x[entity_id]) < 0.1:
+                    direction[entity_id] = -direction[entity_id]
+                sprite.change_x = direction[entity_id] * MUSHROOM_MOVEMENT_SPEED
+                prev_x[entity_id] = sprite.center_x
@@ -1,6 +1,22 @@
 import arcade
+from asset_registry import registry
+from entity_store import EntityStore
 
 class Mystery_Box(arcade.Sprite):
+
+    # Ticks each frame of the flashing "?" is shown for. Every box in a layer
+    # flashes together, played by animation.LayerAnimator.
+    FRAME_TICKS = (16, 5, 5, 5)
+
+    # Frame shown once the box has been hit
+    USED_TEXTURE = 4
+
+    # Frames, loaded by the first box, shared by all of them and kept for
+    # good. Whether a box has been hit is kept in a MysteryBoxStore, so boxes
+    # hold nothing of their own beyond what every Sprite has.
+    box_textures = None
+    animation_textures = None
+
     def __init__(
         self,
         filename: str = None,
@@ -34,17 +50,15 @@ class Mystery_Box(arcade.Sprite):
             center_y=center_y,
         )
 
-        # Used for flipping between image sequences
-        self.cur_texture = 0
         self.scale = scale
 
         # --- Load Textures ---
         main_path = "resources/sprites/"
 
-        self.box_textures = []
-        for i in range(1, 6):
-            texture = arcade.load_texture(f"{main_path}mystery_{i}.png")
-            self.box_textures.append(texture)
+        if Mystery_Box.box_textures is None:
+            Mystery_Box.box_textures = registry.load_textures(
+                [f"{main_path}mystery_{i}.png" for i in range(1, 6)], permanent=True)
+            Mystery_Box.animation_textures = Mystery_Box.box_textures[:Mystery_Box.USED_TEXTURE]
 
         # Set the initial texture
         self.texture = self.box_textures[0]
@@ -54,31 +68,23 @@ class Mystery_Box(arcade.Sprite):
         # set_hit_box = [[-22, -64], [22, -64], [22, 28], [-22, 28]]
         self.hit_box = self.texture.hit_box_points
 
-        self.is_hit = False
 
-        self.update_counter = 0
+class MysteryBoxStore(EntityStore):
+    """Every mystery box in a level, and which ones have been hit"""
+
+    def __init__(self, sprite_lists):
+        super().__init__(sprite_lists)
+        self.is_hit = self.new_field('b', False)
 
-    def update_animation(self, delta_time: float = 1 / 60):
-        
-        if not self.is_hit:
-            if self.update_counter >= 5 and self.update_counter <= 15:
-                if self.cur_texture == 0:
-                    self.update_counter += 1
-                    return
-                self.cur_texture += 1
-                if self.cur_texture > 3:
-                    self.cur_texture = 0
-                self.texture = self.box_textures[self.cur_texture]
-                self.update_counter = 0
-            elif self.update_counter > 15:
-                self.cur_texture += 1
-                if self.cur_texture > 3:
-                    self.cur_texture = 0
-                self.texture = self.box_textures[self.cur_texture]
-                self.update_counter = 0
-        else:
-            self.cur_texture = 4
-            self.texture = self.box_textures[self.cur_texture]
-        
-        # Update our counter
-        self.update_counter += 1
\ No newline at end of file
+    def hit(self, box):
+        """
+        Use up a box. Returns False if it already was. A used box stops
+        flashing, the animator leaves sprites showing anything other than
+        its frames alone.
+        """
+        entity_id = self.entity_ids[box]
+        if self.is_hit[entity_id]:
+            return False
+        self.is_hit[entity_id] = True
+        box.texture = box.box_textures[Mystery_Box.USED_TEXTURE]
+        return True
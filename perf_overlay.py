@@ -0,0 +1,113 @@
+import arcade
+
+# Parts of a tick, in the order they run (see Game.tick)
+TICK_PHASES = ["enemies", "input", "physics", "animation", "camera", "flag", "coins", "stomps", "blocks", "nudge"]
+
+# Whole tick and the parts of drawing a frame
+FRAME_PHASES = ["sim", "render", "scene", "hud"]
+
+# Laying the text out every frame would cost more than what it reports on,
+# so it is only refreshed this often, in frames
+REFRESH_FRAMES = 15
+
+FONT_SIZE = 9
+TEXT_COLOR = arcade.color.WHITE
+BACKGROUND_COLOR = (0, 0, 0, 170)
+
+# Frame time graph, one pixel column pair per frame
+SPARKLINE_STEP = 2
+SPARKLINE_HEIGHT = 40
+SPARKLINE_COLOR = arcade.color.GREEN
+BUDGET_COLOR = arcade.color.RED
+
+# One frame at 60 fps, drawn as a line across the middle of the graph
+FRAME_BUDGET = 1 / 60
+
+MARGIN = 10
+
+
+def format_phases(frame_stats, phases):
+    lines = []
+    for phase in phases:
+        lines.append(f"{phase:<10}{frame_stats.mean_ms(phase):>7.2f}{frame_stats.max_ms(phase):>8.2f}")
+    return lines
+
+
+def format_counts(game):
+    """Live sprites in each layer, two to a line, plus the physics bodies, awake enemies, animating tiles and what the last frame drew"""
+    counts = []
+    if game.scene is not None:
+        for name, sprite_list in game.scene.name_mapping.items():
+            counts.append(f"{name} {len(sprite_list)}")
+    if game.physics_engine is not None:
+        counts.append(f"bodies {game.physics_bodies.live_count}")
+        activation = game.activation
+        counts.append(f"awake {activation.active_count}/{activation.active_count + activation.dormant_count}")
+        counts.append(f"animating {game.coin_animator.visible_count + game.box_animator.visible_count}")
+    if "draw_calls" in game.frame_stats.counters:
+        counts.append(f"draws {game.frame_stats.counters['draw_calls']}")
+        counts.append(f"vertices {game.frame_stats.counters['vertices']}")
+    return ["  ".join(counts[start:start + 2]) for start in range(0, len(counts), 2)]
+
+
+class PerfOverlay:
+    """
+    F3 overlay with the rolling mean and worst time of each phase of a tick
+    and a frame, how many sprites are alive in each layer, and a graph of
+    the recent frame times.
+    """
+
+    def __init__(self, screen_width, screen_height):
+        self.visible = False
+
+        self.left = MARGIN
+        self.top = screen_height - 3 * MARGIN - 60
+        self.width = screen_width / 2
+
+        self.text = arcade.Text("", self.left + MARGIN / 2, self.top - MARGIN / 2, TEXT_COLOR, FONT_SIZE,
+                                multiline=True, width=self.width, anchor_y="top", font_name="Courier New")
+
+        self.frames_until_refresh = 0
+
+    def refresh(self, game):
+        frame_stats = game.frame_stats
+        lines = [f"{'phase (ms)':<10}{'mean':>7}{'max':>8}"]
+        lines += format_phases(frame_stats, TICK_PHASES)
+        lines.append("")
+        lines += format_phases(frame_stats, FRAME_PHASES)
+        lines.append(f"ticks/s {game.timestep.tick_rate}  dropped {game.timestep.dropped_ticks}")
+        lines.append("")
+        lines += format_counts(game)
+        self.text.text = "\n".join(lines)
+
+    def draw_sparkline(self, frame_stats, bottom):
+        """Recent frame times, FRAME_BUDGET is halfway up"""
+        samples = frame_stats.samples.get("frame")
+        if not samples:
+            return
+
+        scale = SPARKLINE_HEIGHT / (2 * FRAME_BUDGET)
+        points = [(self.left + index * SPARKLINE_STEP, bottom + min(seconds * scale, SPARKLINE_HEIGHT))
+                  for index, seconds in enumerate(samples)]
+        right = self.left + (frame_stats.window_size - 1) * SPARKLINE_STEP
+
+        arcade.draw_line(self.left, bottom + SPARKLINE_HEIGHT / 2, right, bottom + SPARKLINE_HEIGHT / 2, BUDGET_COLOR)
+        if len(points) > 1:
+            arcade.draw_line_strip(points, SPARKLINE_COLOR)
+
+    def draw(self, game):
+        """Draw over everything else, in screen space"""
+        if not self.visible:
+            return
+
+        if self.frames_until_refresh <= 0:
+            self.refresh(game)
+            self.frames_until_refresh = REFRESH_FRAMES
+        self.frames_until_refresh -= 1
+
+        game.gui_camera.use()
+
+        bottom = self.top - self.text.content_height - MARGIN - SPARKLINE_HEIGHT
+        arcade.draw_lrtb_rectangle_filled(self.left, self.left + self.width, self.top, bottom - MARGIN, BACKGROUND_COLOR)
+        self.text.draw()
+        self.draw_sparkline(game.frame_stats, bottom)
@@ -0,0 +1,107 @@
+import arcade
+
+
+def move_patrol(sprite):
+    """
+    Move a sprite the way arcade moves a moving platform: at its own
+    velocity, turning around when it reaches one of its boundaries, with no
+    gravity and nothing to collide with. This is how the enemies walk.
+    """
+    if sprite.change_x == 0 and sprite.change_y == 0:
+        return
+
+    if sprite.boundary_left and sprite.left <= sprite.boundary_left:
+        sprite.left = sprite.boundary_left
+        if sprite.change_x < 0:
+            sprite.change_x *= -1
+    if sprite.boundary_right and sprite.right >= sprite.boundary_right:
+        sprite.right = sprite.boundary_right
+        if sprite.change_x > 0:
+            sprite.change_x *= -1
+    sprite.center_x += sprite.change_x
+
+    if sprite.boundary_top is not None and sprite.top >= sprite.boundary_top:
+        sprite.top = sprite.boundary_top
+        if sprite.change_y > 0:
+            sprite.change_y *= -1
+    if sprite.boundary_bottom is not None and sprite.bottom <= sprite.boundary_bottom:
+        sprite.bottom = sprite.boundary_bottom
+        if sprite.change_y < 0:
+            sprite.change_y *= -1
+    sprite.center_y += sprite.change_y
+
+
+class PhysicsBodyManager:
+    """
+    Owns the physics bodies for everything other than Mario: a platformer
+    engine for each mushroom, and a patrol (see move_patrol) for each
+    enemy and shell.
+    All of the engines share one list of walls, so a block taken out of its
+    wall list is gone for them too. A body is retired by remove(), or on the
+    next update once its sprite has been removed from every sprite list.
+    """
+
+    def __init__(self, walls, gravity_constant):
+        # Shared by every engine, so it is only built once per level
+        self.walls = walls
+        self.gravity_constant = gravity_constant
+
+        # sprite -> engine, in the order the bodies were added
+        self.engines = {}
+        # Patrolling sprites, in the order they were added
+        self.patrols = {}
+
+        # Number of bodies that have been retired, for monitoring
+        self.retired_count = 0
+
+    def add(self, sprite):
+        """Give a sprite a physics body, if it does not have one already"""
+        engine = self.engines.get(sprite)
+        if engine is None:
+            engine = arcade.PhysicsEnginePlatformer(sprite, gravity_constant=self.gravity_constant, walls=self.walls)
+            # The engine takes a copy of the list, point it back at the shared one
+            engine.walls = self.walls
+            self.engines[sprite] = engine
+        return engine
+
+    def add_patrol(self, sprite):
+        """Give a sprite a patrol body, if it does not have one already"""
+        self.patrols[sprite] = None
+
+    def remove(self, sprite):
+        """Retire a sprite's body, if it has one, such as when it is stomped or collected"""
+        if sprite in self.engines:
+            del self.engines[sprite]
+        elif sprite in self.patrols:
+            del self.patrols[sprite]
+        else:
+            return
+        self.retired_count += 1
+
+    def update(self, is_dormant=None):
+        """
+        Update every live body, retiring the ones whose sprite is gone.
+        Bodies whose sprite is_dormant(sprite) says is asleep are skipped.
+        """
+        for sprite, engine in list(self.engines.items()):
+            if not sprite.sprite_lists:
+                del self.engines[sprite]
+                self.retired_count += 1
+                continue
+            if is_dormant is not None and is_dormant(sprite):
+                continue
+            engine.update()
+
+        for sprite in list(self.patrols):
+            if not sprite.sprite_lists:
+                del self.patrols[sprite]
+                self.retired_count += 1
+                continue
+            if is_dormant is not None and is_dormant(sprite):
+                continue
+            move_patrol(sprite)
+
+    @property
+    def live_count(self):
+        """Number of bodies that are currently being simulated"""
+        return len(self.engines) + len(self.patrols)
@@ -0,0 +1,107 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+SAVE_DIRECTORY = "resources/save_data"
+
+# How long the writer waits for more saves before going to disk, in seconds.
+# A burst of saves (a death right after a level change, say) becomes one write.
+FLUSH_DELAY = 0.5
+
+
+class SaveManager:
+    """
+    Keeps every save slot in memory and writes them out on a background thread.
+    Saving only updates the in-memory copy, so the game never waits on the
+    disk. Files are replaced atomically (write a temp file, fsync, rename),
+    so a crash mid-write leaves the previous save intact.
+    Slot "1" lives in save_1.json, slot "0" in save_0.json and so on.
+    """
+
+    def __init__(self, directory=SAVE_DIRECTORY):
+        self.directory = directory
+
+        # slot -> save data, and the slots that haven't been written yet
+        self.slots = {}
+        self.dirty = set()
+
+        # Guards slots/dirty, and wakes up the writer thread
+        self.condition = threading.Condition()
+        # Only one thread writes files at a time
+        self.write_lock = threading.Lock()
+        self.thread = None
+
+        # Counters for monitoring: saves asked for vs files actually written
+        self.saves = 0
+        self.writes = 0
+
+    def get_path(self, slot):
+        return os.path.join(self.directory, f"save_{slot}.json")
+
+    def load(self, slot):
+        """Get a copy of a slot's save data, reading the file only the first time"""
+        with self.condition:
+            data = self.slots.get(slot)
+            if data is None:
+                with open(self.get_path(slot)) as save_file:
+                    data = json.load(save_file)
+                self.slots[slot] = data
+            return dict(data)
+
+    def save(self, slot, data):
+        """Store a slot's save data. It reaches the disk shortly after, off this thread."""
+        with self.condition:
+            self.slots[slot] = dict(data)
+            self.dirty.add(slot)
+            self.saves += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="save-writer", daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def flush(self):
+        """Write every slot that is waiting, right now, on this thread"""
+        with self.write_lock:
+            for slot, data in self._take_dirty():
+                self._write(slot, data)
+
+    def _take_dirty(self):
+        with self.condition:
+            pending = [(slot, self.slots[slot]) for slot in sorted(self.dirty)]
+            self.dirty.clear()
+        return pending
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.dirty:
+                    self.condition.wait()
+            # Let a burst of saves pile up, then write the latest of each slot once
+            time.sleep(FLUSH_DELAY)
+            self.flush()
+
+    def _write(self, slot, data):
+        path = self.get_path(slot)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as save_file:
+            json.dump(data, save_file)
+            save_file.flush()
+            os.fsync(save_file.fileno())
+        os.replace(temp_path, path)
+        self.writes += 1
+
+    def stats(self):
+        return {
+            'saves': self.saves,
+            'writes': self.writes,
+            'pending': len(self.dirty),
+        }
+
+
+# Shared by the title screen and the game
+saves = SaveManager()
+
+# Don't lose a save that was still waiting for the writer
+atexit.register(saves.flush)
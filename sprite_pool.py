@@ -0,0 +1,63 @@
+import arcade
+from asset_registry import registry
+
+
+class SpritePool:
+    """
+    Sprites of one image that come and go during play (squished goombas,
+    shells), made when the level loads instead of in the middle of a tick.
+
+    acquire() hands out a sprite that isn't in any sprite list. The game
+    just takes sprites out of the level as before, and reclaim() puts the
+    ones that have been taken out back in the pool. If the pool runs dry a
+    new sprite is made, from the texture it already has.
+    """
+
+    def __init__(self, filename, scale, size):
+        self.scale = scale
+        self.texture = registry.load_texture(filename, owner=self)
+
+        self.free = [self.make_sprite() for _ in range(size)]
+        self.in_use = []
+
+        # Sprites made after the level loaded, for monitoring
+        self.misses = 0
+
+    def make_sprite(self):
+        return arcade.Sprite(texture=self.texture, scale=self.scale)
+
+    def upload(self, atlas):
+        """Put the texture in the atlas now, so the first one drawn doesn't stall the frame"""
+        if not atlas.has_texture(self.texture):
+            atlas.add(self.texture)
+
+    def acquire(self):
+        if self.free:
+            sprite = self.free.pop()
+        else:
+            sprite = self.make_sprite()
+            self.misses += 1
+        self.in_use.append(sprite)
+        return sprite
+
+    def reclaim(self, is_dormant=None):
+        """
+        Take back every sprite that has been removed from the level. Sprites
+        that is_dormant(sprite) says are asleep are left alone, the
+        activation region still holds on to them.
+        """
+        still_in_use = []
+        for sprite in self.in_use:
+            if sprite.sprite_lists or (is_dormant is not None and is_dormant(sprite)):
+                still_in_use.append(sprite)
+                continue
+            sprite.change_x = 0
+            sprite.change_y = 0
+            sprite.boundary_left = None
+            sprite.boundary_right = None
+            self.free.append(sprite)
+        self.in_use = still_in_use
+
+    @property
+    def in_use_count(self):
+        return len(self.in_use)
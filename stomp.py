@@ -0,0 +1,52 @@
+# Half the width of the strip under Mario's feet that counts as a stomp
+FOOT_HALF_WIDTH = 16
+
+# Number of frames a squished enemy stays on screen
+SQUISH_FRAME_COUNT = 20
+
+
+class FootBox:
+    """
+    Rectangle under Mario's feet.
+    Has the same left/right/bottom/top attributes as a sprite, so it can be
+    handed straight to a spatial hash.
+    """
+
+    def __init__(self, center_x, foot_y):
+        self.left = center_x - FOOT_HALF_WIDTH
+        self.right = center_x + FOOT_HALF_WIDTH
+        self.bottom = foot_y
+        self.top = foot_y
+
+
+def get_stomped_enemies(mario, enemy_list, foot_y):
+    """
+    Get the enemies that Mario is standing on, using one rectangle query
+    against the enemy list's spatial hash.
+    Every enemy shows up at most once in the result.
+    """
+    foot_box = FootBox(int(mario.center_x), foot_y)
+
+    if enemy_list.spatial_hash:
+        candidates = enemy_list.spatial_hash.get_objects_for_box(foot_box)
+    else:
+        candidates = enemy_list
+
+    stomped = [
+        enemy
+        for enemy in candidates
+        if enemy.left <= foot_box.right and enemy.right >= foot_box.left
+        and enemy.bottom <= foot_box.top and enemy.top >= foot_box.bottom
+    ]
+
+    # The spatial hash hands back a set, keep the order stable from frame to frame
+    stomped.sort(key=lambda enemy: (enemy.center_x, enemy.center_y))
+    return stomped
+
+
+def update_squished(squished_list):
+    """Count down the squished enemies and remove the ones that are done"""
+    for squished in list(squished_list):
+        squished.frames_left -= 1
+        if squished.frames_left <= 0:
+            squished.remove_from_sprite_lists()
@@ -14,10 +14,27 @@ import launch
 from enemy import Koopa
 import random
 from mario import Mario
-import json
-from mystery_box import Mystery_Box
+from mystery_box import Mystery_Box, MysteryBoxStore
 from coin import Coin
-from mushroom import Mushroom
+from mushroom import Mushroom, MushroomStore
+from asset_registry import registry
+import stomp
+import broadphase
+from enemy_physics import create_physics_bodies
+from activation import ActivationRegion
+from animation import LayerAnimator
+from level_cache import LevelCache
+from audio import AudioManager
+from save_manager import saves
+from hud import Hud
+from frame_stats import FrameStats
+from perf_overlay import PerfOverlay
+from chunked_scene import ChunkedScene
+from sprite_pool import SpritePool
+from tile_grid import TileGrid
+from teleporters import TeleporterTable
+from collision_geometry import get_merged_walls
+from fixed_timestep import FixedTimestep, Interpolator, lerp, SNAP_DISTANCE
 
 # --- Constants
 SCREEN_TITLE = "Platformer"
@@ -56,37 +73,135 @@ LAYER_NAME_TELEPORT_EVENT = "Teleport"
 LAYER_NAME_DOOR = "Next_Level_Door"
 LAYER_NAME_FLAG_BOTTOM = "Flag_Bottom"
 LAYER_NAME_MUSHROOM = "Mushroom"
-
-class MyGame(arcade.Window):
+LAYER_NAME_SQUISHED = "Squished"
+
+# Layers whose sprites never move sideways, drawn in chunks (see chunked_scene.py).
+# Blocks break and boxes change texture, which only touches their own chunk.
+STATIC_DRAW_LAYERS = [LAYER_NAME_BACKGROUND, LAYER_NAME_PLATFORMS, LAYER_NAME_PLATFORMS_BREAKABLE,
+                      LAYER_NAME_MYSTERY_ITEM, LAYER_NAME_MYSTERY_COIN, LAYER_NAME_COINS,
+                      LAYER_NAME_FLAG, LAYER_NAME_FLAG_BOTTOM, LAYER_NAME_DOOR]
+
+# Sprites made ahead of time for each level (see sprite_pool.py). A shell
+# lasts until it is stomped again, a squished goomba for
+# stomp.SQUISH_FRAME_COUNT ticks, so a few of each is plenty.
+SHELL_POOL_SIZE = 4
+SQUISHED_POOL_SIZE = 4
+
+# Every world, in the order they are played
+STAGES = ["1-1", "1-2", "1-3"]
+
+
+def get_map_name(world):
+    """Tiled map file for a world"""
+    return f"resources/backgrounds/{world}/world_{world}.tmx"
+
+
+# Layer specific options are defined based on Layer names in a dictionary
+# Doing this will make the SpriteList for the platforms layer
+# use spatial hashing for detection.
+LAYER_OPTIONS = {
+
+    LAYER_NAME_TELEPORT_EVENT: {
+        "use_spatial_hash": True,
+        },
+    LAYER_NAME_PLATFORMS: {
+        "use_spatial_hash": True,
+        "hit_box_algorithm": "None",
+    },
+    LAYER_NAME_PLATFORMS_BREAKABLE: {
+        "use_spatial_hash": True,
+        "hit_box_algorithm": "None",
+    },
+    LAYER_NAME_MYSTERY_ITEM: {
+        "use_spatial_hash": True,
+        "custom_class": Mystery_Box,
+    },
+    LAYER_NAME_MYSTERY_COIN: {
+        "use_spatial_hash": True,
+        "custom_class": Mystery_Box,
+    },
+    LAYER_NAME_COINS: {
+        "use_spatial_hash": True,
+        "custom_class": Coin,
+    },
+    LAYER_NAME_BACKGROUND: {
+        "use_spatial_hash": True,
+    },
+    LAYER_NAME_FLAG: {
+        "use_spatial_hash": True,
+    },
+    # Enemies are spatially hashed so stomps can be found with a
+    # single box query (see stomp.py)
+    LAYER_NAME_GOOMBA: {
+        "use_spatial_hash": True,
+    },
+    LAYER_NAME_KOOPA: {
+        "use_spatial_hash": True,
+        "custom_class": Koopa
+    },
+    LAYER_NAME_MUSHROOM: {
+        "use_spatial_hash": False,
+        "hit_box_algorithm": "None",
+        "custom_class": Mushroom
+    },
+    LAYER_NAME_DOOR: {
+        "use_spatial_hash": True,
+    },
+    LAYER_NAME_FLAG_BOTTOM: {
+        "use_spatial_hash": True,
+    },
+}
+
+
+class HeadlessCamera:
+    """Stands in for arcade.Camera when there is no window to draw to"""
+
+    def __init__(self, viewport_width, viewport_height):
+        self.viewport_width = viewport_width
+        self.viewport_height = viewport_height
+        self.position = (0, 0)
+
+    def move_to(self, vector, speed=1.0):
+        self.position = vector
+
+    def use(self):
+        pass
+
+
+class Game:
     """
-    Main application class.
+    The game itself, drawn in the MyGame window it is given. With no window
+    it runs headless: no rendering and no audio, only the game logic (see
+    headless.py).
     """
 
-    def __init__(self):
+    def __init__(self, window=None):
 
-        # Call the parent class and set up the window
-        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT,
-                         SCREEN_TITLE, resizable=False)
+        self.window = window
+        headless = window is None
+        self.headless = headless
 
         # Put saved stuff here
-        save_name = "1"
-        self.save_path = f"resources/save_data/save_{save_name}.json"
-        save_file = open(self.save_path)
-        save_data = json.load(save_file)
+        self.save_slot = "1"
+        save_data = saves.load(self.save_slot)
         
         self.score = save_data['score']
         self.coin_count = save_data['coin_count']
         self.lives = save_data['lives']
         self.stage = save_data['stage']
-        
-        save_file.close()
 
         # Our TileMap Object
         self.tile_map = None
 
+        # Worlds that have already been loaded, so respawns don't re-parse them
+        self.level_cache = LevelCache(background=not headless)
+
         # Our Scene Object
         self.scene = None
 
+        # Draws the scene, with the layers that don't move split into chunks
+        self.scene_renderer = None
+
         # Separate variable that holds the player sprite
         self.mario = None
 
@@ -107,12 +222,13 @@ class MyGame(arcade.Window):
 
         self.no_lives = False
 
-        self.squish_counter = 0
-
         self.shell_hit = 0
 
         self.add_num = 0
 
+        # How long the score popup has been up, in ticks
+        self.score_popup_ticks = 0
+
         # Our physics engine
         self.physics_engine = None
 
@@ -127,32 +243,62 @@ class MyGame(arcade.Window):
         self.shell_list = []
         
         # -- sounds --
-        self.jump_sound = arcade.load_sound("resources/sounds/jump_sound.wav")
+        # Effects are decoded once and share a fixed pool of voices.
+        # max_concurrent caps how many copies of one effect can overlap,
+        # and a higher priority lets an effect take a voice from a lower one.
+        self.audio = AudioManager(enabled=not headless)
 
-        self.coin_sound = arcade.load_sound("resources/sounds/smw_coin.wav")
+        self.jump_sound = self.audio.load_effect("resources/sounds/jump_sound.wav", max_concurrent=1)
 
-        self.break_sound = arcade.load_sound("resources/sounds/Break.wav")
+        self.coin_sound = self.audio.load_effect("resources/sounds/smw_coin.wav", max_concurrent=2)
 
-        self.bump_sound = arcade.load_sound("resources/sounds/bump.wav")
+        self.break_sound = self.audio.load_effect("resources/sounds/Break.wav", max_concurrent=2)
+
+        self.bump_sound = self.audio.load_effect("resources/sounds/bump.wav", max_concurrent=1)
         
-        self.squish_sound = arcade.load_sound("resources/sounds/Squish.wav")
+        self.squish_sound = self.audio.load_effect("resources/sounds/Squish.wav", max_concurrent=2)
 
-        self.powerup_sound = arcade.load_sound("resources/sounds/powerup.wav")
+        self.powerup_sound = self.audio.load_effect("resources/sounds/powerup.wav", max_concurrent=1, priority=1)
 
-        self.powerup_appears_sound = arcade.load_sound("resources/sounds/powerup_appears.wav")
+        self.powerup_appears_sound = self.audio.load_effect("resources/sounds/powerup_appears.wav", max_concurrent=1, priority=1)
 
-        self.death_sound = arcade.load_sound("resources/sounds/death.wav")
+        self.death_sound = self.audio.load_effect("resources/sounds/death.wav", max_concurrent=1, priority=2)
 
-        self.clear_sound = arcade.load_sound("resources/sounds/clear.wav")
+        self.clear_sound = self.audio.load_effect("resources/sounds/clear.wav", max_concurrent=1, priority=2)
 
-        self.pipe_sound = arcade.load_sound("resources/sounds/pipe.wav")
+        self.pipe_sound = self.audio.load_effect("resources/sounds/pipe.wav", max_concurrent=1)
 
-        self.music = arcade.load_sound("resources/sounds/music.wav")
+        self.music = self.audio.load_music("resources/sounds/music.wav")
         
 
         # A Camera that can be used for scrolling the screen
         self.camera = None
 
+        # A Camera that doesn't scroll, for the HUD
+        self.gui_camera = None
+
+        # Text objects for the HUD are kept between frames. There is nothing
+        # to draw them on in headless mode.
+        self.hud = None if self.headless else Hud(SCREEN_WIDTH, SCREEN_HEIGHT, DEFAULT_FONT_SIZE)
+
+        # Rolling timings of each part of a frame, shown by the F3 overlay
+        self.frame_stats = FrameStats()
+        self.perf_overlay = None if self.headless else PerfOverlay(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+        # The game logic runs in fixed ticks, however often on_update is called
+        self.timestep = FixedTimestep()
+
+        # Draws moving sprites, and the camera, in between ticks
+        self.interpolator = Interpolator()
+        self.previous_screen_center_x = 0
+
+        # Ticks run since the game started, recorded input is lined up with it
+        self.tick_count = 0
+
+        # Set by input_replay.py to record key presses, or to play them back
+        self.input_recorder = None
+        self.input_replayer = None
+
         self.screen_center_x = 0
         self.screen_center_y = 0
 
@@ -165,13 +311,14 @@ class MyGame(arcade.Window):
         self.grab_shell = False
 
         # different levels
-        self.stages = ["1-1", "1-2", "1-3"]
+        self.stages = list(STAGES)
         self.stage_num = self.stages.index(self.stage)
         self.mario_world = self.stages[self.stage_num]
         self.success_map = False
 
         # background color
-        arcade.set_background_color(arcade.color.BLACK)
+        if not self.headless:
+            arcade.set_background_color(arcade.color.BLACK)
 
         # background imags
         
@@ -221,11 +368,23 @@ class MyGame(arcade.Window):
         self.screen_center_y = 0
         
         # Set up the Camera
-        self.camera = arcade.Camera(self.width, self.height)
+        if self.headless:
+            self.camera = HeadlessCamera(SCREEN_WIDTH, SCREEN_HEIGHT)
+            self.gui_camera = HeadlessCamera(SCREEN_WIDTH, SCREEN_HEIGHT)
+        else:
+            self.camera = arcade.Camera(self.window.width, self.window.height)
+            self.gui_camera = arcade.Camera(self.window.width, self.window.height)
         
         player_centered = self.screen_center_x, self.screen_center_y
 
         self.camera.move_to(player_centered)
+
+        # Nothing to draw in between until the new level has run a tick
+        self.interpolator.clear()
+        self.previous_screen_center_x = self.screen_center_x
+
+        # Start loading the world now, so it is ready by the end of the intro
+        self.level_future = self.preload_world(self.stage_num)
         
     def setup_part_2(self):
 
@@ -238,62 +397,14 @@ class MyGame(arcade.Window):
         # Name of map file to load
         # Can modify this by replacing instances of '1-1' with self.stage
         map_name =  self.next_world()  #"resources/backgrounds/1-1/world_1-1.json" #
-        # Layer specific options are defined based on Layer names in a dictionary
-        # Doing this will make the SpriteList for the platforms layer
-        # use spatial hashing for detection.
-        layer_options = {
-
-            LAYER_NAME_TELEPORT_EVENT: {
-                "use_spatial_hash": True,
-                },
-            LAYER_NAME_PLATFORMS: {
-                "use_spatial_hash": True,
-                "hit_box_algorithm": "None",
-            },
-            LAYER_NAME_PLATFORMS_BREAKABLE: {
-                "use_spatial_hash": True,
-                "hit_box_algorithm": "None",
-            },
-            LAYER_NAME_MYSTERY_ITEM: {
-                "use_spatial_hash": True,
-                "custom_class": Mystery_Box,
-            },
-            LAYER_NAME_MYSTERY_COIN: {
-                "use_spatial_hash": True,
-                "custom_class": Mystery_Box,
-            },
-            LAYER_NAME_COINS: {
-                "use_spatial_hash": True,
-                "custom_class": Coin,
-            },
-            LAYER_NAME_BACKGROUND: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_FLAG: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_GOOMBA: {
-                "use_spatial_hash": False,
-            },
-            LAYER_NAME_KOOPA: {
-                "use_spatial_hash": False,
-                "custom_class": Koopa
-            },
-            LAYER_NAME_MUSHROOM: {
-                "use_spatial_hash": False,
-                "hit_box_algorithm": "None",
-                "custom_class": Mushroom
-            },
-            LAYER_NAME_DOOR: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_FLAG_BOTTOM: {
-                "use_spatial_hash": True,
-            },
-        }
+        # Read in the tiled map, or reset the copy we already have
+        self.tile_map = self.level_cache.load(map_name, TILE_SCALING, LAYER_OPTIONS)
 
-        # Read in the tiled map
-        self.tile_map = arcade.load_tilemap(map_name, TILE_SCALING, layer_options)
+        # The sprite lists may have been built on the loader thread, which
+        # can't touch OpenGL, so upload them to the GPU here
+        if not self.headless:
+            for sprite_list in self.tile_map.sprite_lists.values():
+                sprite_list.initialize()
 
         # Initialize Scene with our TileMap, this will automatically add all layers
         # from the map as SpriteLists in the scene in the proper order.
@@ -318,17 +429,9 @@ class MyGame(arcade.Window):
         # Powerups
         self.mushroom_list = self.tile_map.sprite_lists[LAYER_NAME_MUSHROOM]
         
-        # teleport locations
-        full_teleport_list = self.tile_map.object_lists[LAYER_NAME_TELEPORT_EVENT]
-        
-        self.teleport_enter_list = []
-        self.teleport_exit_list = []
-        
-        for teleporter in full_teleport_list:
-            if "enter" in teleporter.name:
-                self.teleport_enter_list.append(teleporter)
-            else:
-                self.teleport_exit_list.append(teleporter)
+        # teleport locations, in world coordinates and looked up by where Mario is
+        self.teleporters = TeleporterTable(
+            self.tile_map.object_lists[LAYER_NAME_TELEPORT_EVENT], TILE_SCALING, SCREEN_HEIGHT)
         
         # Set background image
         self.background_list = self.tile_map.sprite_lists[LAYER_NAME_BACKGROUND]
@@ -354,25 +457,98 @@ class MyGame(arcade.Window):
         self.scene[LAYER_NAME_GOOMBA]
         self.scene[LAYER_NAME_KOOPA]
 
+        # Shells are koopas too, this list just marks which ones
+        self.shell_list = arcade.SpriteList()
+
+        # Squished goombas get their own layer, drawn just above the goombas
+        self.squished_list = arcade.SpriteList()
+        self.scene.add_sprite_list_after(LAYER_NAME_SQUISHED, LAYER_NAME_GOOMBA, sprite_list=self.squished_list)
+
+        # Sprites that show up during play are made now, so a stomp or a
+        # death doesn't load anything in the middle of a tick
+        self.shell_pool = SpritePool("resources/sprites/koopa_shell.png", CHARACTER_SCALING, SHELL_POOL_SIZE)
+        self.squished_pool = SpritePool("resources/sprites/goomba_squish.png", CHARACTER_SCALING, SQUISHED_POOL_SIZE)
+        self.defeated_pool = SpritePool("resources/sprites/mario_defeated.png", CHARACTER_SCALING, 1)
+        if not self.headless:
+            for pool in (self.shell_pool, self.squished_pool, self.defeated_pool):
+                pool.upload(self.window.ctx.default_atlas)
+
+        # The tiles are drawn a screen wide chunk at a time, and only the
+        # chunks the camera can see
+        if not self.headless:
+            if self.scene_renderer is not None:
+                self.scene_renderer.release()
+            self.scene_renderer = ChunkedScene(self.scene, STATIC_DRAW_LAYERS)
+
         # --- Other stuff
         # Create the 'physics engine'
-        walls = [self.platform_list, self.platform_breakable_list, self.mystery_item_list, self.mystery_coin_list]
+        # The platforms never change, so the physics collides with them as a
+        # few big rectangles instead of one sprite per tile
+        self.walls = [get_merged_walls(self.platform_list), self.platform_breakable_list,
+                      self.mystery_item_list, self.mystery_coin_list]
+        # Mario collides with the enemies the same as with walls. They move
+        # with the rest of the physics bodies rather than as arcade's
+        # moving platforms, so his engine only has him to move.
         self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.mario, gravity_constant=GRAVITY, walls=walls, platforms=[self.goomba_list, self.koopa_list]
+            self.mario, gravity_constant=GRAVITY, walls=self.walls + [self.goomba_list, self.koopa_list]
         )
-        self.physics_engine_list = []
+        # Physics for everything else, which shares Mario's walls
+        self.physics_bodies = create_physics_bodies(self.walls, GRAVITY, GRID_PIXEL_SIZE)
+        for enemy_list in (self.goomba_list, self.koopa_list):
+            for enemy in enemy_list:
+                self.physics_bodies.add_patrol(enemy)
+
+        # Which block is in each cell, for the checks above mario's head
+        self.breakable_grid = TileGrid(self.platform_breakable_list, GRID_PIXEL_SIZE, self.tile_map.width, self.tile_map.height)
+        self.mystery_coin_grid = TileGrid(self.mystery_coin_list, GRID_PIXEL_SIZE, self.tile_map.width, self.tile_map.height)
+        self.mystery_item_grid = TileGrid(self.mystery_item_list, GRID_PIXEL_SIZE, self.tile_map.width, self.tile_map.height)
+
+        # Enemies and mushrooms sleep until the camera gets close to them
+        self.activation = ActivationRegion([self.goomba_list, self.koopa_list, self.mushroom_list], SCREEN_WIDTH)
+
+        # Gameplay state of the boxes and mushrooms, kept apart from their sprites
+        self.boxes = MysteryBoxStore([self.mystery_coin_list, self.mystery_item_list])
+        self.mushrooms = MushroomStore([self.mushroom_list])
 
-        self.music_ref = arcade.play_sound(self.music, volume=0.5)
+        # All the coins spin together and all the boxes flash together
+        self.coin_animator = LayerAnimator([self.coin_list], SCREEN_WIDTH)
+        self.box_animator = LayerAnimator([self.mystery_coin_list, self.mystery_item_list], SCREEN_WIDTH)
+
+        self.music_ref = self.audio.play_music(self.music, volume=0.5)
         
         self.success_map = False
 
+        # The old world's sprites are gone now, let go of any textures
+        # that the new world did not pick up again
+        registry.purge()
+
         
 
     def on_draw(self):
         """Render the screen."""
+        with self.frame_stats.measure("render"):
+            # Move things part of the way to where the next tick puts them,
+            # then back again so the game logic never sees it
+            alpha = self.timestep.alpha
+            self.interpolator.apply(alpha)
+            self.draw_frame(alpha)
+            self.interpolator.restore()
+
+            if self.perf_overlay is not None:
+                self.perf_overlay.draw(self)
+
+    def draw_frame(self, alpha):
         # Clear the screen to the background color
-        self.clear()
-        
+        self.window.clear()
+
+        # The camera follows Mario smoothly too, unless it just jumped
+        # somewhere (a pipe). The quest over screen puts it at 0 itself.
+        if not self.stage_intro and not self.quest_bool:
+            camera_x = self.screen_center_x
+            if abs(camera_x - self.previous_screen_center_x) <= SNAP_DISTANCE:
+                camera_x = lerp(self.previous_screen_center_x, camera_x, alpha)
+            self.camera.move_to((camera_x, self.screen_center_y))
+
         # Activate our Camera
         self.camera.use()
         
@@ -380,28 +556,24 @@ class MyGame(arcade.Window):
             
             arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, self.stagestart)
             
-            draw_string = f"WORLD  {self.stage}\n\n\t\t{self.lives}"
-            
             self.draw_text()
             
-            arcade.draw_text(draw_string,
-                             self.screen_center_x,
-                             self.screen_center_y + SCREEN_HEIGHT/2 + 3*DEFAULT_FONT_SIZE,
-                             arcade.color.WHITE,
-                             DEFAULT_FONT_SIZE * 1.5,
-                             multiline = True,
-                             width=SCREEN_WIDTH,
-                             align="center",
-                             font_name="Kenney Pixel")
+            with self.frame_stats.measure("hud"):
+                self.hud.draw_intro(self.stage, self.lives)
             
             return
         
         
         # Draw our Scene
-        # Draw the platforms
-        self.scene.draw(pixelated=True)
-        # Draw the player
-        self.mario.draw(pixelated=True)
+        with self.frame_stats.measure("scene"):
+            # Draw the platforms
+            view_left = self.camera.position[0]
+            self.scene_renderer.draw(view_left, view_left + SCREEN_WIDTH, pixelated=True)
+            # Draw the player
+            self.mario.draw(pixelated=True)
+
+        self.frame_stats.set_counter("draw_calls", self.scene_renderer.draw_calls + 1)
+        self.frame_stats.set_counter("vertices", self.scene_renderer.vertices + 1)
 
         if self.timer <= 0:
             arcade.draw_lrwh_rectangle_textured(0, 0,
@@ -424,34 +596,40 @@ class MyGame(arcade.Window):
         
     def draw_text(self):
         # Draw the text last, so it goes on top
-        # Have to squeeze everything into one text draw, otherwise major lag
-        draw_string = f"MARIO \t\t COINS \t\t WORLD \t\t TIME \n{self.score:06d}  \t\t {self.coin_count:02d} \t\t\t   {self.mario_world} \t\t {self.timer:03d}"
-        
-        arcade.draw_text(draw_string,
-                         self.screen_center_x + SCREEN_WIDTH / 10,
-                         SCREEN_HEIGHT - 2 * DEFAULT_FONT_SIZE,
-                         arcade.color.WHITE,
-                         DEFAULT_FONT_SIZE,
-                         multiline = True,
-                         width=SCREEN_WIDTH,
-                         align="left",
-                         font_name="Kenney Pixel")
-        if self.add_to_score:
-            self.frame_counter += 1
-            arcade.draw_text(str(self.add_num),
-                         self.mario.center_x - 275,
-                         self.mario.center_y,
-                         arcade.color.WHITE,
-                         20,
-                         width=SCREEN_WIDTH,
-                         align="center",
-                         font_name="Kenney Pixel")
-            if self.frame_counter > SCORE_FRAME_COUNT:
-                self.add_to_score = False
-                self.frame_counter = 0        
+        # The HUD only lays its text out again when a value in it changes
+        with self.frame_stats.measure("hud"):
+            if self.add_to_score:
+                self.hud.draw_popup(self.add_num, self.mario.center_x - 275, self.mario.center_y)
+
+            # The status line stays put while the level scrolls
+            self.gui_camera.use()
+            self.hud.draw_status(self.score, self.coin_count, self.mario_world, self.timer)
+
+        self.frame_stats.set_counter("hud_relayouts", self.hud.relayouts)
 
     def on_key_press(self, key, modifiers):
         """Called whenever a key is pressed."""
+        # Debug display, not part of the game so it isn't recorded
+        if key == arcade.key.F3 and self.perf_overlay is not None:
+            self.perf_overlay.visible = not self.perf_overlay.visible
+            return
+
+        # The keyboard is ignored while a recording plays
+        if self.input_replayer is not None:
+            return
+        if self.input_recorder is not None:
+            self.input_recorder.record(self.tick_count, key, True)
+        self.handle_key_press(key)
+
+    def on_key_release(self, key, modifiers):
+        """Called when the user releases a key."""
+        if self.input_replayer is not None:
+            return
+        if self.input_recorder is not None:
+            self.input_recorder.record(self.tick_count, key, False)
+        self.handle_key_release(key)
+
+    def handle_key_press(self, key):
         # Make sure that we are supposed to be doing updates
         if self.stage_intro:
             return
@@ -463,7 +641,7 @@ class MyGame(arcade.Window):
             # Prevents the user from double jumping
             self.jump_key_down = False
             if self.physics_engine.can_jump():
-                arcade.play_sound(self.jump_sound, volume=0.05)
+                self.audio.play(self.jump_sound, volume=0.05)
             self.enter_pipe("up")
             
         # Left
@@ -501,8 +679,7 @@ class MyGame(arcade.Window):
             self.grab_shell = True
 
 
-    def on_key_release(self, key, modifiers):
-        """Called when the user releases a key."""
+    def handle_key_release(self, key):
         if key == arcade.key.LEFT or key == arcade.key.A:
             self.left_key_down = False
         elif key == arcade.key.RIGHT or key == arcade.key.D:
@@ -513,65 +690,46 @@ class MyGame(arcade.Window):
 
     def enter_pipe(self, direction):
         "Called for each directional key press, check if there is a pipe to enter, and enter it"
+        if not self.teleporters.has_entrances(direction):
+            return
+
+        # The 'activator' point just past Mario's feet, head or side, whichever way he's going
+        if direction == "down":
+            x = self.mario.center_x
+            y = self.mario.center_y - self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 5
+        elif direction == "up":
+            x = self.mario.center_x
+            y = self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 5
+        elif direction == "left":
+            x = self.mario.center_x - SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 5
+            y = self.mario.center_y
+        else:
+            x = self.mario.center_x + SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 5
+            y = self.mario.center_y
+
         # Pipe Collision
-        for teleporter in self.teleport_enter_list:
-            if direction in teleporter.name:
-                if direction in ["up","down"]:
-                    # Need horizontal checks
-                    right_of_pipe = self.mario.center_x > teleporter.shape[0][0] * TILE_SCALING
-                    left_of_pipe = self.mario.center_x < teleporter.shape[2][0] * TILE_SCALING
-                     
-                    if direction == "down":
-                        height_check_below = self.mario.center_y - self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 5
-                        in_pipe_vertical_zone = height_check_below < SCREEN_HEIGHT + teleporter.shape[0][1] * TILE_SCALING
-                    else:
-                        # direction will be "up"
-                        height_check_above = self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 5
-                        in_pipe_vertical_zone = height_check_above > SCREEN_HEIGHT + teleporter.shape[2][1] * TILE_SCALING
-                        
-                    
-                    if right_of_pipe and left_of_pipe and in_pipe_vertical_zone:
-                        # All conditions met, go throught the pipe
-                        arcade.play_sound(self.pipe_sound)
-                        self.exit_pipe(teleporter.name[:2])
-                        return
-                 
-                elif direction in ["right","left"]:
-                    # Need vertical checks
-                    above_pipe = self.mario.center_y > SCREEN_HEIGHT + teleporter.shape[2][1] * TILE_SCALING
-                    below_pipe = self.mario.center_y < SCREEN_HEIGHT + teleporter.shape[0][1] * TILE_SCALING
-                    
-                    # Check to see that the 'activator' pixel is within the left/right bounds
-                    if direction == "left":
-                        right_of_pipe = self.mario.center_x - SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 5 > teleporter.shape[0][0] * TILE_SCALING
-                        left_of_pipe = self.mario.center_x - SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 5 < teleporter.shape[2][0] * TILE_SCALING
-                        
-                    else:
-                        right_of_pipe = self.mario.center_x + SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 5 > teleporter.shape[0][0] * TILE_SCALING
-                        left_of_pipe = self.mario.center_x + SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 5 < teleporter.shape[2][0] * TILE_SCALING
-                     
-                    if above_pipe and below_pipe and right_of_pipe and left_of_pipe:
-                        arcade.play_sound(self.pipe_sound)
-                        self.exit_pipe(teleporter.name[:2])
-                        return
-                     
-            
+        entrance = self.teleporters.find_entrance(direction, x, y)
+        if entrance is not None:
+            # All conditions met, go throught the pipe
+            self.audio.play(self.pipe_sound)
+            self.exit_pipe(entrance.pair_id)
+
+
     def exit_pipe(self, teleport_id):
         # Find output pipe position
-        for teleporter_output in self.teleport_exit_list:
-            # If the identifier characters are present, thats the pair
-            if teleport_id in teleporter_output.name:
-                # Note, in actuality one version would be needed for each direction
-                # as with enter_pipe
-                # However, in the interest of time, I won't do that
-                
-                self.mario.center_x = teleporter_output.shape[2][0] * TILE_SCALING
-                self.mario.center_y = SCREEN_HEIGHT + teleporter_output.shape[0][1] * TILE_SCALING
-                
-                self.screen_center_x = 0
-                self.screen_center_y = 0
-                # self.camera.move_to((self.screen_center_x, self.screen_center_y))
-        
+        position = self.teleporters.get_exit(teleport_id)
+        if position is None:
+            return
+
+        # Note, in actuality one version would be needed for each direction
+        # as with enter_pipe
+        # However, in the interest of time, I won't do that
+        self.mario.center_x, self.mario.center_y = position
+
+        self.screen_center_x = 0
+        self.screen_center_y = 0
+        # self.camera.move_to((self.screen_center_x, self.screen_center_y))
+
 
     def center_camera_to_player(self):
         if (self.mario.center_x - (self.camera.viewport_width / 3)) > self.screen_center_x:
@@ -586,6 +744,52 @@ class MyGame(arcade.Window):
         self.camera.move_to(player_centered)
 
     def on_update(self, delta_time):
+        """Run as many ticks of game logic as the time since the last frame covers"""
+        self.frame_stats.record("frame", delta_time)
+
+        ticks = self.timestep.advance(delta_time)
+        for tick in range(ticks):
+            # Remember where things were before the last tick, to draw in between
+            if tick == ticks - 1:
+                self.capture_positions()
+            with self.frame_stats.measure("sim"):
+                self.tick()
+
+        self.frame_stats.set_counter("dropped_ticks", self.timestep.dropped_ticks)
+
+    def capture_positions(self):
+        self.previous_screen_center_x = self.screen_center_x
+        if self.stage_intro:
+            self.interpolator.clear()
+            return
+
+        sprites = [self.mario]
+        if self.is_defeated:
+            sprites.append(self.defeated)
+        # Sleeping enemies don't move
+        sprites.extend(self.activation.active)
+        self.interpolator.capture(sprites)
+
+    def tick(self):
+        """One fixed step of the game logic, see fixed_timestep.py"""
+        delta_time = self.timestep.tick_delta
+
+        # Recorded key presses for this tick go in before it runs
+        if self.input_recorder is not None:
+            self.input_recorder.checkpoint(self)
+        if self.input_replayer is not None:
+            self.input_replayer.replay_tick(self)
+        self.tick_count += 1
+
+        # Free up the voices of sound effects that have finished
+        self.audio.update()
+
+        # Count down the score popup
+        if self.add_to_score:
+            self.score_popup_ticks += 1
+            if self.score_popup_ticks > SCORE_FRAME_COUNT:
+                self.add_to_score = False
+                self.score_popup_ticks = 0
 
         if self.quest_bool:
             self.frame_counter += 1
@@ -605,8 +809,13 @@ class MyGame(arcade.Window):
         # Only display the intro during the intro
         if self.stage_intro:
             self.frame_counter += 1
+
+            # A world with no compiled bundle yet is parsed here, where the
+            # screen is standing still anyway
+            self.level_cache.run_deferred()
             
-            if self.frame_counter == INTRO_FRAME_COUNT or self.success_map:
+            # Gameplay only starts once the world has finished loading
+            if (self.frame_counter >= INTRO_FRAME_COUNT or self.success_map) and self.level_future.done():
                 self.stage_intro = False
                 self.setup_part_2()
                 
@@ -659,50 +868,56 @@ class MyGame(arcade.Window):
             # Player dies if they fall below the world or run out of time
             if self.mario.center_y < -SPRITE_PIXEL_SIZE or self.timer <= 0:
                 self.player_die()
+
+            # Each part of the tick is timed for the performance overlay
+            self.frame_stats.start_laps()
             
-            self.scene.update([LAYER_NAME_GOOMBA])
-            self.scene.update([LAYER_NAME_KOOPA])
-            self.scene.update([LAYER_NAME_MUSHROOM])
+            # Only the enemies and mushrooms near the camera move
+            self.activation.update(self.screen_center_x)
+            for sprite in self.activation.active:
+                sprite.update()
+            self.mushrooms.update(is_dormant=self.activation.is_dormant)
+            self.frame_stats.lap("enemies")
                 
         
             # Player movement and physics engine
             self.mario.update_movement(self.left_key_down, self.right_key_down, self.jump_key_down, self.sprint_key_down, self.physics_engine)
+            self.frame_stats.lap("input")
             self.physics_engine.update()
-            for engine in self.physics_engine_list:
-                engine.update()
+            self.physics_bodies.update(is_dormant=self.activation.is_dormant)
+            self.frame_stats.lap("physics")
                 
 
             if self.stage_num == 2:
                 self.last_level = True
 
             # Update Animations
+            # Mario animates himself while sliding down the flag
             if not self.mario_flag:
-                self.scene.update_animation(delta_time,
-                                            [LAYER_NAME_PLAYER,
-                                             LAYER_NAME_MYSTERY_COIN,
-                                             LAYER_NAME_MYSTERY_ITEM,
-                                             LAYER_NAME_COINS,
-                                             LAYER_NAME_GOOMBA,
-                                             LAYER_NAME_KOOPA,
-                                             LAYER_NAME_MUSHROOM])
+                self.scene.update_animation(delta_time, [LAYER_NAME_PLAYER])
+
+            # Only touches the coins and boxes on screen, and only when the frame changes
+            self.coin_animator.update(self.screen_center_x)
+            self.box_animator.update(self.screen_center_x)
+
+            # Sleeping enemies don't animate either
+            for sprite in self.activation.active:
+                sprite.update_animation(delta_time)
+            self.frame_stats.lap("animation")
 
-            else:
-                self.scene.update_animation(
-                    delta_time, [LAYER_NAME_MYSTERY_COIN, LAYER_NAME_MYSTERY_ITEM, LAYER_NAME_COINS, LAYER_NAME_GOOMBA, LAYER_NAME_KOOPA, LAYER_NAME_MUSHROOM]
-                )
-
-                self.scene.update_animation(delta_time,
-                                            [LAYER_NAME_MYSTERY_COIN,
-                                             LAYER_NAME_MYSTERY_ITEM,
-                                             LAYER_NAME_COINS])
             # Position the camera
             self.center_camera_to_player()
+            self.frame_stats.lap("camera")
 
 
             # if get to flagpole
             if arcade.check_for_collision_with_list(self.mario, self.flag_list):
                 self.mario_flag = True
 
+                # The next world is known now, load it while Mario slides down
+                if self.stage_num + 1 < len(self.stages):
+                    self.level_future = self.preload_world(self.stage_num + 1)
+
             else:
 
                 self.mario_flag = False
@@ -713,7 +928,8 @@ class MyGame(arcade.Window):
                 if arcade.check_for_collision_with_list(self.mario, self.flag_bottom_list):
                     self.mario.texture = self.mario.slide_textures[1]
                     self.mario.center_x = self.mario.center_x + SPRITE_PIXEL_SIZE
-                    time.sleep(0.5)
+                    if not self.headless:
+                        time.sleep(0.5)
                     self.mario_door = True
                     self.mario_flag_bottom = True
 
@@ -730,6 +946,8 @@ class MyGame(arcade.Window):
 
                 
                 
+            self.frame_stats.lap("flag")
+
             # See if the coin is hitting a platform
             coin_hit_list = arcade.check_for_collision_with_list(self.mario, self.coin_list)
             
@@ -744,9 +962,11 @@ class MyGame(arcade.Window):
                 # Remove the coin
                 coin.remove_from_sprite_lists()
                 # Play a sound
-                arcade.play_sound(self.coin_sound, volume = 2)
+                self.audio.play(self.coin_sound, volume = 2)
                 
                 
+            self.frame_stats.lap("coins")
+
             # Need for both breaking blocks and pipes above/below mario
             self.height_multiplier = int(self.mario.power > 0) + 1
              
@@ -755,74 +975,52 @@ class MyGame(arcade.Window):
             """---- this is for KOOPA mario collision -----
             if koopa jumped on turns into shell that mario can collect"""
 
-            # Define the range of x-coordinates
-            x_range = range(int(self.mario.center_x) - 16, int(self.mario.center_x) + 17)  # Extend range by 1 to include both end points
+            # Shells and squished goombas taken out of the level since last
+            # tick go back to their pools
+            self.shell_pool.reclaim(is_dormant=self.activation.is_dormant)
+            self.squished_pool.reclaim()
 
-            
-            # Iterate over each x-coordinate in the range
-            for x in x_range:
-                new_sprite = False
-                # Call get_sprites_at_point for each x-coordinate
-                koopa_hit_list = arcade.get_sprites_at_point((x, self.mario.center_y - self.height_multiplier * KOOPA_PIXEL_SIZE * CHARACTER_SCALING / 2 - 2), self.koopa_list)
-                for koopa in koopa_hit_list:
-                   self.mario.change_y = 5
-                   if self.mario.can_take_damage:
-                        walls = [self.platform_list, self.platform_breakable_list, self.mystery_item_list, self.mystery_coin_list]
-                        self.physics_engine_list.append(arcade.PhysicsEnginePlatformer(koopa, gravity_constant=GRAVITY, walls=walls))
-                        self.frame_counter = 0
-                        self.update_score(100)
-                        arcade.play_sound(self.squish_sound)
-                        enemy_y = koopa.center_y
-                        #print(enemy_y)
-                        # creates a new enemy object with the shell instead
-                        # Workaround to tell if this is a new shell
-                        k_shell = None
-                        if koopa.alpha != 254:
-                            koopa.remove_from_sprite_lists()
-                            k_shell = arcade.Sprite("resources/sprites/koopa_shell.png", CHARACTER_SCALING)
-                            k_shell.boundary_left = koopa.boundary_left
-                            k_shell.boundary_right = koopa.boundary_right
-                            offset_distance = 30
-                            if self.mario.change_x >= 0 and not new_sprite:
-                                k_shell.position = (self.mario.center_x + offset_distance, enemy_y - 20)
-                            elif self.mario.change_x < 0 and not new_sprite:
-                                k_shell.position = (self.mario.center_x - offset_distance, enemy_y - 20)
-                        else:
-                            koopa.remove_from_sprite_lists()
-                            k_shell = arcade.Sprite("resources/sprites/koopa_shell.png", CHARACTER_SCALING)
-                            k_shell.boundary_left = koopa.boundary_left
-                            k_shell.boundary_right = koopa.boundary_right
-                            offset_distance = 30
-                            if self.mario.change_x >= 0 and not new_sprite:
-                                k_shell.position = (self.mario.center_x + offset_distance, enemy_y)
-                            elif self.mario.change_x < 0 and not new_sprite:
-                                k_shell.position = (self.mario.center_x - offset_distance, enemy_y)
-
-                        k_shell.change_x = 3
-
-                        k_shell.alpha = 254
-
-                        if len(k_shell.sprite_lists) == 0:
-                            self.koopa_list.append(k_shell)
-                        if k_shell in self.koopa_list:
-                            new_sprite = True
-                        if self.mario.collides_with_sprite(k_shell):    
-                            self.mario.change_y = 3
-                            k_shell.remove_from_sprite_lists()
+            # One query for the strip under Mario's feet, each koopa comes back once
+            koopa_foot_y = self.mario.center_y - self.height_multiplier * KOOPA_PIXEL_SIZE * CHARACTER_SCALING / 2 - 2
+            for koopa in stomp.get_stomped_enemies(self.mario, self.koopa_list, koopa_foot_y):
+                self.mario.change_y = 5
+                if self.mario.can_take_damage:
+                    self.frame_counter = 0
+                    self.update_score(100)
+                    self.audio.play(self.squish_sound)
+                    enemy_y = koopa.center_y
+                    # A walking koopa is taller than its shell, so drop the shell down a bit
+                    if koopa not in self.shell_list:
+                        enemy_y -= 20
+
+                    # creates a new enemy object with the shell instead
+                    koopa.remove_from_sprite_lists()
+                    self.physics_bodies.remove(koopa)
+                    k_shell = self.shell_pool.acquire()
+                    k_shell.boundary_left = koopa.boundary_left
+                    k_shell.boundary_right = koopa.boundary_right
+                    offset_distance = 30
+                    if self.mario.change_x >= 0:
+                        k_shell.position = (self.mario.center_x + offset_distance, enemy_y)
+                    else:
+                        k_shell.position = (self.mario.center_x - offset_distance, enemy_y)
+
+                    k_shell.change_x = 3
+
+                    self.koopa_list.append(k_shell)
+                    self.shell_list.append(k_shell)
+                    self.activation.add(k_shell)
+                    self.physics_bodies.add_patrol(k_shell)
+                    if self.mario.collides_with_sprite(k_shell):
+                        self.mario.change_y = 3
+                        k_shell.remove_from_sprite_lists()
+                        self.physics_bodies.remove(k_shell)
 
             # Check for shell collision with other enemies
-            for koopa in self.koopa_list:
-                for shell in self.koopa_list:
-                    if shell.alpha == 254:
-                        if shell.collides_with_sprite(koopa) and shell != koopa:
-                            koopa.change_y = -3
-                            koopa.change_x = 1
-                for goomba in self.goomba_list:
-                    if shell.alpha == 254:
-                        if shell.collides_with_sprite(goomba):
-                            goomba.change_y = -3
-                            goomba.change_x = 1
-                            #goomba.remove_from_sprite_lists()
+            for shell, enemy in broadphase.get_shell_collisions(self.shell_list, [self.koopa_list, self.goomba_list]):
+                enemy.change_y = -3
+                enemy.change_x = 1
+                #enemy.remove_from_sprite_lists()
 
             
 
@@ -830,41 +1028,32 @@ class MyGame(arcade.Window):
             if goomba is jumped on changes to squished image"""
 
 
-            # Define the range of x-coordinates
-            x_range = range(int(self.mario.center_x) - 16, int(self.mario.center_x) + 17)  # Extend range by 1 to include both end points
-            
-            # Iterate over each x-coordinate in the range
-            for x in x_range:
-                is_squished = False
-                # Call get_sprites_at_point for each x-coordinate
-                goomba_hit_list = arcade.get_sprites_at_point((x, self.mario.center_y - self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 2), self.goomba_list)
-                if self.mario.can_take_damage:
-                    for goomba in goomba_hit_list:
-                        self.mario.change_y = 5
-                        walls = [self.platform_list, self.platform_breakable_list, self.mystery_item_list, self.mystery_coin_list]
-                        self.physics_engine_list.append(arcade.PhysicsEnginePlatformer(goomba, gravity_constant=GRAVITY, walls=walls))
-                        self.update_score(100)
-                        arcade.play_sound(self.squish_sound)
-                        # make a animation that displays score
-                        enemy_position = goomba.position
-                        goomba.remove_from_sprite_lists()
-                        squished = arcade.Sprite("resources/sprites/goomba_squish.png", CHARACTER_SCALING)
-                        
-                        squished.position = enemy_position
-                        if self.mario.power == 0 and not is_squished:
-                            squished.center_y = self.mario.center_y - 50
-                            self.goomba_list.append(squished)
-                        elif self.mario.power == 1 and not is_squished:
-                            squished.center_y = self.mario.center_y - 70
-                            self.goomba_list.append(squished)
-                        self.squish_counter += 1
-                        if self.squish_counter >= 2:
-                            squished.remove_from_sprite_lists()
-                            self.squish_counter = 0
-                        if squished.center_y <= 80:
-                            squished.remove_from_sprite_lists()
-
-                        
+            # One query for the strip under Mario's feet, each goomba comes back once
+            goomba_foot_y = self.mario.center_y - self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 - 2
+            if self.mario.can_take_damage:
+                for goomba in stomp.get_stomped_enemies(self.mario, self.goomba_list, goomba_foot_y):
+                    self.mario.change_y = 5
+                    self.update_score(100)
+                    self.audio.play(self.squish_sound)
+                    # make a animation that displays score
+                    enemy_position = goomba.position
+                    goomba.remove_from_sprite_lists()
+                    self.physics_bodies.remove(goomba)
+                    squished = self.squished_pool.acquire()
+
+                    squished.position = enemy_position
+                    if self.mario.power == 0:
+                        squished.center_y = self.mario.center_y - 50
+                    elif self.mario.power == 1:
+                        squished.center_y = self.mario.center_y - 70
+
+                    # Squished goombas can't be stomped or hurt Mario, they
+                    # just sit there for a few frames
+                    squished.frames_left = stomp.SQUISH_FRAME_COUNT
+                    self.squished_list.append(squished)
+
+            stomp.update_squished(self.squished_list)
+
             #mushroom kills mario- todo: fix this so jumping on top doesn't kill mario
             mario_glist = arcade.check_for_collision_with_list(self.mario, self.goomba_list) #change ot enemy_hit_list?
             mario_klist = arcade.check_for_collision_with_list(self.mario, self.koopa_list)
@@ -873,23 +1062,12 @@ class MyGame(arcade.Window):
                 if (mario_glist or mario_klist) and self.mario.power == 0:
                     self.player_die()
                 elif (mario_glist or mario_klist) and self.mario.power == 1:
-                    arcade.play_sound(self.pipe_sound)
+                    self.audio.play(self.pipe_sound)
                     self.mario.prev_power()
             
-            # Note that the multiplier for getting either side of mario's head (0.7)
-            # Is just barely smaller than it needs to be - it is possible to
-            # hit the block without it being added to the hit list
-            # However, increasing the value to 0.75 is just barely too much,
-            # and it is possible to hit a block from the side
-            
-            # Git the block list for the left side of mario's head
-            block_hit_list = arcade.get_sprites_at_point((self.mario.center_x - 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.platform_breakable_list)
-            
-            # Add to that list the blocks on the right side of mario's head
-            block_hit_list.extend(arcade.get_sprites_at_point((self.mario.center_x + 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.platform_breakable_list))
-            
-            # Turn that list into a set to eliminate duplicate values
-            block_hit_list = set(block_hit_list)
+            self.frame_stats.lap("stomps")
+
+            block_hit_list = self.get_bumped_tiles(self.breakable_grid)
             # Later, add a requisite that the mario must be big
             for block in block_hit_list:
                 # Perhaps change this to a call to a function that activates some block_break
@@ -897,51 +1075,34 @@ class MyGame(arcade.Window):
                 # Remove the block
                 if self.mario.power > 0:
                     block.remove_from_sprite_lists()
+                    self.breakable_grid.remove(block)
                     # Play a sound (change to breaking sound)
-                    arcade.play_sound(self.break_sound)
+                    self.audio.play(self.break_sound)
                 
                 else:
                     # This means Mario is small, bump the block!
                     self.nudged_blocks_list_set[4].append(block)
-                    arcade.play_sound(self.bump_sound)
+                    self.audio.play(self.bump_sound)
                     # Play a sound (change to nudging sound)
                     # arcade.play_sound(self.coin_sound)
 
-            # Git the block list for the left side of mario's head
-            mystery_coin_hit_list = arcade.get_sprites_at_point((self.mario.center_x - 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.mystery_coin_list)
-            
-            # Add to that list the blocks on the right side of mario's head
-            mystery_coin_hit_list.extend(arcade.get_sprites_at_point((self.mario.center_x + 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.mystery_coin_list))
-            
-            # Turn that list into a set to eliminate duplicate values
-            mystery_coin_hit_list = set(mystery_coin_hit_list)
+            mystery_coin_hit_list = self.get_bumped_tiles(self.mystery_coin_grid)
 
             for block in mystery_coin_hit_list:
-                if not block.is_hit:
+                if self.boxes.hit(block):
                     self.coin_count += 1
-                    block.is_hit = True
-                    arcade.play_sound(self.coin_sound, volume = 2)
+                    self.audio.play(self.coin_sound, volume = 2)
                     self.nudged_blocks_list_set[4].append(block)
                     
-            # Get the block list for the left side of mario's head
-            mystery_item_hit_list = arcade.get_sprites_at_point((self.mario.center_x - 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.mystery_item_list)
-            
-            # Add to that list the blocks on the right side of mario's head
-            mystery_item_hit_list.extend(arcade.get_sprites_at_point((self.mario.center_x + 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2, self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1), self.mystery_item_list))
-            
-            # Turn that list into a set to eliminate duplicate values
-            mystery_item_hit_list = set(mystery_item_hit_list)
+            mystery_item_hit_list = self.get_bumped_tiles(self.mystery_item_grid)
 
             for box in mystery_item_hit_list:
-                if not box.is_hit:
-                    box.is_hit = True
+                if self.boxes.hit(box):
                     self.nudged_blocks_list_set[4].append(box)
                     for shroom in self.mushroom_list:
-                        if box.collides_with_sprite(shroom) and not shroom.is_hit: 
-                            arcade.play_sound(self.powerup_appears_sound, volume = 2)
-                            shroom.is_hit = True
-                            walls = [self.platform_list, self.platform_breakable_list, self.mystery_item_list, self.mystery_coin_list]
-                            self.physics_engine_list.append(arcade.PhysicsEnginePlatformer(shroom, gravity_constant=GRAVITY, walls=walls))
+                        if box.collides_with_sprite(shroom) and self.mushrooms.release(shroom):
+                            self.audio.play(self.powerup_appears_sound, volume = 2)
+                            self.physics_bodies.add(shroom)
             
             
             # See if the mario collected a mushroom powerup
@@ -952,11 +1113,15 @@ class MyGame(arcade.Window):
 
                 # Remove the mushroom
                 shroom.remove_from_sprite_lists()
+                self.physics_bodies.remove(shroom)
 
                 # Play a sound
-                arcade.play_sound(self.powerup_sound, volume = 2)
+                self.audio.play(self.powerup_sound, volume = 2)
+
+            self.frame_stats.lap("blocks")
 
             self.nudge_blocks()
+            self.frame_stats.lap("nudge")
 
         else:
             # Only update the animation for Mario
@@ -969,6 +1134,7 @@ class MyGame(arcade.Window):
         self.score += score
         self.add_num = score
         self.add_to_score = True
+        self.score_popup_ticks = 0
         
         
     def is_sprite_on_screen(self, sprite):
@@ -997,13 +1163,29 @@ class MyGame(arcade.Window):
                     
                 self.nudged_blocks_list_set = temp_nudged_blocks_list_set
     
+    def get_bumped_tiles(self, tile_grid):
+        """The tiles just above the left and right side of mario's head"""
+        # Note that the multiplier for getting either side of mario's head (0.7)
+        # Is just barely smaller than it needs to be - it is possible to
+        # hit the block without it being added to the hit list
+        # However, increasing the value to 0.75 is just barely too much,
+        # and it is possible to hit a block from the side
+        half_width = 0.7 * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2
+        head_y = self.mario.center_y + self.height_multiplier * SPRITE_PIXEL_SIZE * CHARACTER_SCALING / 2 + 1
+
+        hit_list = tile_grid.get_tiles_at_point((self.mario.center_x - half_width, head_y))
+        hit_list.extend(tile_grid.get_tiles_at_point((self.mario.center_x + half_width, head_y)))
+
+        # Turn that list into a set to eliminate duplicate values
+        return set(hit_list)
+
     def flag_animation(self):
         self.end_of_level = True
         self.update_score(500)
 
-        if arcade.Sound.is_playing(self.music_ref, self.music_ref):
-            arcade.stop_sound(self.music_ref)
-            arcade.play_sound(self.clear_sound)
+        if self.audio.is_playing(self.music_ref):
+            self.audio.stop(self.music_ref)
+            self.audio.play(self.clear_sound)
 
 
         if self.mario.center_y > SPRITE_PIXEL_SIZE * TILE_SCALING * 4:
@@ -1012,35 +1194,53 @@ class MyGame(arcade.Window):
             if not arcade.check_for_collision_with_list(self.mario, self.door):
                 self.mario.walk_to_door()
             else:
-                self.mario_door = False
                 if self.stage_num == 2:
+                    self.mario_door = False
                     self.quest_bool = True
                 else:
-                    self.stage_num += 1
-                    self.next_world()
-                    self.setup_part_2()
+                    # A world with no bundle yet is parsed now, rather than
+                    # while Mario was sliding down the flag
+                    self.level_cache.run_deferred()
+                    if self.level_future.done():
+                        # Mario waits at the door until the next world has finished loading
+                        self.mario_door = False
+                        self.stage_num += 1
+                        self.next_world()
+                        self.setup_part_2()
     
 
 
+    def preload_world(self, stage_num):
+        """Start loading a world in the background, returns a future for its TileMap"""
+        map_name = get_map_name(self.stages[stage_num])
+        return self.level_cache.preload(map_name, TILE_SCALING, LAYER_OPTIONS)
+
     def next_world(self):
         # Name of map file to load
         self.mario_world = self.stages[self.stage_num]
-        print("stage is: ", self.mario_world)
-        map_name = f"resources/backgrounds/{self.mario_world}/world_{self.mario_world}.tmx"
+        if not self.headless:
+            print("stage is: ", self.mario_world)
+        map_name = get_map_name(self.mario_world)
         self.success_map = True
         self.stage = self.mario_world
         return map_name
         
+    def close(self):
+        """Stop the background loader, for when the window closes"""
+        self.level_cache.close()
+
     def save(self):
-        save_file = open(self.save_path, "w")
+        # Simulations and replays should never touch the player's save file
+        if self.headless or self.input_replayer is not None:
+            return
+        # Only updates the copy in memory, the file is written in the background
         save_data = {
             'score' : self.score,
             'coin_count' : self.coin_count,
             'lives' : self.lives,
             'stage' : self.stage
         }
-        json.dump(save_data, save_file)        
-        save_file.close()
+        saves.save(self.save_slot, save_data)
         
     def player_die(self):
         
@@ -1051,22 +1251,22 @@ class MyGame(arcade.Window):
         self.frame_counter = 0
         self.is_defeated = True
         
-        arcade.stop_sound(self.music_ref)
+        self.audio.stop(self.music_ref)
 
         if not self.end_of_level:
             self.lives -= 1
-            arcade.stop_sound(self.music_ref)
-            arcade.play_sound(self.death_sound)
+            self.audio.stop(self.music_ref)
+            self.audio.play(self.death_sound)
         
         
-        self.defeated = arcade.Sprite("resources/sprites/mario_defeated.png", CHARACTER_SCALING)
+        self.defeated = self.defeated_pool.acquire()
         
         self.defeated.position = self.mario.position
         
         # Make the player invisible
         self.mario.visible = False
-        # Add the defeated mario to coins list (bit of a hack to cut down on number of lists)
-        self.coin_list.append(self.defeated)
+        # Draw the defeated mario with the player
+        self.scene.add_sprite(LAYER_NAME_PLAYER, self.defeated)
         
         
         # Set the timer and position to be safe, so it is not called again
@@ -1075,6 +1275,39 @@ class MyGame(arcade.Window):
         
 
 
+class MyGame(arcade.Window):
+    """
+    Main application class, the window a Game is played in.
+    """
+
+    def __init__(self):
+
+        # Call the parent class and set up the window
+        super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT,
+                         SCREEN_TITLE, resizable=False)
+
+        self.game = Game(self)
+
+    def setup(self):
+        self.game.setup()
+
+    def on_draw(self):
+        self.game.on_draw()
+
+    def on_update(self, delta_time):
+        self.game.on_update(delta_time)
+
+    def on_key_press(self, key, modifiers):
+        self.game.on_key_press(key, modifiers)
+
+    def on_key_release(self, key, modifiers):
+        self.game.on_key_release(key, modifiers)
+
+    def on_close(self):
+        self.game.close()
+        super().on_close()
+
+
 def main():
     """Main function"""
     # window = MyGame()
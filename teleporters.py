@@ -0,0 +1,99 @@
+import math
+import re
+
+# Directions a pipe can be entered in, as they appear in the object names
+DIRECTIONS = ("up", "down", "left", "right")
+
+# Width of the columns pipe entrances are bucketed into, in pixels
+BUCKET_WIDTH = 160
+
+# Objects in the Teleport layer are named p<pair><enter|leave><where>, such
+# as p1enterdown and p1leavebottom. Every entrance of a pair leads to the
+# pair's exit.
+TELEPORTER_NAME = re.compile(r"(p\d+)(enter|leave)")
+
+
+class PipeEntrance:
+    """
+    Where a pipe can be entered from, in world coordinates. A probe point
+    next to Mario has to be inside it: between left and right, and for a
+    side pipe between bottom and top. A pipe in the floor only needs the
+    probe below its top, and one in the ceiling above its bottom.
+    """
+
+    def __init__(self, pair_id, direction, left, right, bottom, top):
+        self.pair_id = pair_id
+        self.direction = direction
+        self.left = left
+        self.right = right
+        self.bottom = bottom
+        self.top = top
+
+    def contains(self, x, y):
+        if not self.left < x < self.right:
+            return False
+        if self.direction == "down":
+            return y < self.top
+        if self.direction == "up":
+            return y > self.bottom
+        return self.bottom < y < self.top
+
+
+class TeleporterTable:
+    """
+    The Teleport object layer, compiled when the level loads.
+    Entrances are kept per direction in columns of BUCKET_WIDTH pixels, so
+    finding the pipe at a point only looks at the ones in that column, and
+    exits are looked up by pair.
+    """
+
+    def __init__(self, teleporters, scaling, screen_height, bucket_width=BUCKET_WIDTH):
+        self.bucket_width = bucket_width
+
+        # direction -> column -> entrances that reach into that column
+        self.entrances = {direction: {} for direction in DIRECTIONS}
+        # pair id -> where Mario comes out
+        self.exits = {}
+
+        for teleporter in teleporters:
+            match = TELEPORTER_NAME.match(teleporter.name)
+            if match is None:
+                continue
+            pair_id, kind = match.groups()
+
+            # The map is in Tiled's coordinates, y down from the top. The
+            # first point of the shape is its top left, the third its bottom right.
+            left = teleporter.shape[0][0] * scaling
+            right = teleporter.shape[2][0] * scaling
+            top = screen_height + teleporter.shape[0][1] * scaling
+            bottom = screen_height + teleporter.shape[2][1] * scaling
+
+            if kind == "leave":
+                # Out at the top right corner. A later exit for the same pair wins.
+                self.exits[pair_id] = (right, top)
+                continue
+
+            for direction in DIRECTIONS:
+                if direction in teleporter.name[match.end():]:
+                    entrance = PipeEntrance(pair_id, direction, left, right, bottom, top)
+                    buckets = self.entrances[direction]
+                    for column in range(self.get_column(left), self.get_column(right) + 1):
+                        buckets.setdefault(column, []).append(entrance)
+
+    def get_column(self, x):
+        return math.floor(x / self.bucket_width)
+
+    def has_entrances(self, direction):
+        """Whether any pipe in the level is entered going this way"""
+        return bool(self.entrances[direction])
+
+    def find_entrance(self, direction, x, y):
+        """The pipe entered going this way with the probe point at (x, y), or None"""
+        for entrance in self.entrances[direction].get(self.get_column(x), ()):
+            if entrance.contains(x, y):
+                return entrance
+        return None
+
+    def get_exit(self, pair_id):
+        """Where Mario comes out of the pair's exit, or None if it has none"""
+        return self.exits.get(pair_id)
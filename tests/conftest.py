@@ -0,0 +1,17 @@
+import functools
+import os
+import sys
+
+# The game's modules live at the top of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import arcade
+import super_mario
+
+
+@functools.lru_cache(maxsize=None)
+def load_world(world):
+    """A world's TileMap straight from its map file, loaded once per test run"""
+    return arcade.load_tilemap(super_mario.get_map_name(world), super_mario.TILE_SCALING, super_mario.LAYER_OPTIONS)
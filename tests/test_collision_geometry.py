@@ -0,0 +1,81 @@
+import random
+
+import arcade
+import pytest
+
+import super_mario
+from collision_geometry import find_rectangles, get_merged_walls
+from conftest import load_world
+
+TILE = super_mario.GRID_PIXEL_SIZE
+
+PROBES_PER_WORLD = 20000
+
+
+def make_tiles(cells):
+    tiles = []
+    for column, row in cells:
+        tile = arcade.SpriteSolidColor(int(TILE), int(TILE), arcade.color.WHITE)
+        tile.left = column * TILE
+        tile.bottom = row * TILE
+        tiles.append(tile)
+    return tiles
+
+
+def get_covered_cells(rectangles):
+    """Every cell the rectangles cover, failing if two of them overlap"""
+    cells = set()
+    for left, bottom, right, top in rectangles:
+        for column in range(round(left / TILE), round(right / TILE)):
+            for row in range(round(bottom / TILE), round(top / TILE)):
+                assert (column, row) not in cells
+                cells.add((column, row))
+    return cells
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_rectangles_cover_exactly_the_tiles(seed):
+    rng = random.Random(seed)
+    cells = {(rng.randrange(30), rng.randrange(12)) for _ in range(rng.randrange(1, 200))}
+    rectangles = find_rectangles(make_tiles(cells), TILE, TILE)
+    assert get_covered_cells(rectangles) == cells
+
+
+def test_ground_row_and_pipe_merge():
+    ground = {(column, 0) for column in range(10)}
+    pipe = {(column, row) for column in (4, 5) for row in (1, 2, 3)}
+    rectangles = find_rectangles(make_tiles(ground | pipe), TILE, TILE)
+    assert sorted(rectangles) == [(0, 0, 10 * TILE, TILE), (4 * TILE, TILE, 6 * TILE, 4 * TILE)]
+
+
+def test_rows_with_a_gap_between_are_not_merged():
+    rectangles = find_rectangles(make_tiles({(0, 0), (0, 2)}), TILE, TILE)
+    assert sorted(rectangles) == [(0, 0, TILE, TILE), (0, 2 * TILE, TILE, 3 * TILE)]
+
+
+def get_probe_points(rng, tiles, width, height):
+    """Random points over the level, plus points right on and around tile edges and corners"""
+    points = [(rng.uniform(-TILE, width + TILE), rng.uniform(-TILE, height + TILE))
+              for _ in range(PROBES_PER_WORLD // 2)]
+    for _ in range(PROBES_PER_WORLD // 2):
+        tile = rng.choice(tiles)
+        x = rng.choice((tile.left, tile.right, tile.center_x)) + rng.choice((-1, -0.5, 0, 0.5, 1))
+        y = rng.choice((tile.bottom, tile.top, tile.center_y)) + rng.choice((-1, -0.5, 0, 0.5, 1))
+        points.append((x, y))
+    return points
+
+
+@pytest.mark.parametrize("world", super_mario.STAGES)
+def test_merged_walls_match_tiles(world):
+    tile_map = load_world(world)
+    platforms = tile_map.sprite_lists[super_mario.LAYER_NAME_PLATFORMS]
+    walls = get_merged_walls(platforms)
+    assert len(walls) < len(platforms)
+
+    rng = random.Random(world)
+    width = tile_map.width * TILE
+    height = tile_map.height * TILE
+    for point in get_probe_points(rng, list(platforms), width, height):
+        in_tiles = bool(arcade.get_sprites_at_point(point, platforms))
+        in_walls = bool(arcade.get_sprites_at_point(point, walls))
+        assert in_tiles == in_walls, point
@@ -0,0 +1,116 @@
+import arcade
+import pytest
+
+from enemy_physics import BatchedPhysicsBodies, np
+from physics_bodies import move_patrol
+
+pytestmark = pytest.mark.skipif(np is None, reason="needs NumPy")
+
+TILE = 40
+
+
+def make_enemy(center_x, change_x, boundary_left=None, boundary_right=None, change_y=0.0):
+    enemy = arcade.SpriteSolidColor(TILE, TILE, arcade.color.WHITE)
+    enemy.position = (center_x, 100)
+    enemy.change_x = change_x
+    enemy.change_y = change_y
+    enemy.boundary_left = boundary_left
+    enemy.boundary_right = boundary_right
+    return enemy
+
+
+def make_enemy_list():
+    # Spatially hashed, or arcade wants a window to check collisions on the GPU
+    enemies = arcade.SpriteList(use_spatial_hash=True, lazy=True)
+    enemies.extend(make_enemies())
+    return enemies
+
+
+def make_enemies():
+    return [
+        make_enemy(200, -1, 100, 300),
+        make_enemy(290, 3, 100, 300),
+        # Left of its patrol when it starts, and a boundary of 0 is none
+        make_enemy(50, -2, 100, 300),
+        make_enemy(500, -1, 0, 600),
+        # Standing still, and knocked out of the level by a shell
+        make_enemy(700, 0, 600, 800),
+        make_enemy(900, 1, 800, 1000, change_y=-3),
+    ]
+
+
+def test_patrols_move_like_arcade_moving_platforms():
+    arcade_enemies = make_enemy_list()
+    mario = arcade.SpriteSolidColor(TILE, TILE, arcade.color.RED)
+    mario.position = (-1000, 1000)
+    engine = arcade.PhysicsEnginePlatformer(mario, platforms=arcade_enemies, gravity_constant=0)
+
+    single = make_enemy_list()
+
+    batched = make_enemy_list()
+    bodies = BatchedPhysicsBodies([], 1, TILE)
+    for enemy in batched:
+        bodies.add_patrol(enemy)
+
+    for tick in range(400):
+        engine.update()
+        for enemy in single:
+            move_patrol(enemy)
+        bodies.update()
+        for expected, moved, batched_enemy in zip(arcade_enemies, single, batched):
+            assert moved.position == pytest.approx(expected.position), tick
+            assert batched_enemy.position == pytest.approx(expected.position), tick
+            assert (batched_enemy.change_x, batched_enemy.change_y) == (expected.change_x, expected.change_y), tick
+
+
+def test_dormant_and_removed_patrols():
+    enemies = make_enemy_list()
+    bodies = BatchedPhysicsBodies([], 1, TILE)
+    for enemy in enemies:
+        bodies.add_patrol(enemy)
+    asleep = enemies[0]
+    gone = enemies[1]
+    gone.remove_from_sprite_lists()
+
+    bodies.update(is_dormant=lambda sprite: sprite is asleep)
+    assert asleep.center_x == 200
+    assert gone.center_x == 290
+    assert bodies.live_count == len(enemies)
+    assert bodies.retired_count == 1
+
+
+def test_removed_bodies_are_retired():
+    enemies = make_enemy_list()
+    bodies = BatchedPhysicsBodies([], 1, TILE)
+    for enemy in enemies:
+        bodies.add_patrol(enemy)
+    stomped = enemies[2]
+    start_x = stomped.center_x
+
+    bodies.remove(stomped)
+    bodies.remove(stomped)
+    bodies.update()
+    assert stomped.center_x == start_x
+    assert bodies.live_count == len(enemies) - 1
+    assert bodies.retired_count == 1
+
+
+def test_broken_block_is_taken_out_of_the_walls():
+    floor = arcade.SpriteList(use_spatial_hash=True, lazy=True)
+    for column in range(3):
+        block = arcade.SpriteSolidColor(TILE, TILE, arcade.color.WHITE)
+        block.position = (column * TILE + TILE / 2, TILE / 2)
+        floor.append(block)
+    mushroom = make_enemy(TILE * 3 / 2, 0)
+    mushroom.bottom = TILE
+    # Only a sprite that is in the level has a live body
+    arcade.SpriteList(lazy=True).append(mushroom)
+
+    bodies = BatchedPhysicsBodies([floor], 1, TILE)
+    bodies.add(mushroom)
+    bodies.update()
+    assert mushroom.bottom == pytest.approx(TILE)
+
+    floor[1].remove_from_sprite_lists()
+    bodies.update()
+    assert mushroom.bottom < TILE
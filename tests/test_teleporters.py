@@ -0,0 +1,127 @@
+import random
+
+import arcade
+import pytest
+
+import super_mario
+from conftest import load_world
+from teleporters import DIRECTIONS, TeleporterTable
+
+SCALING = super_mario.TILE_SCALING
+SCREEN_HEIGHT = super_mario.SCREEN_HEIGHT
+
+PROBES_PER_WORLD = 20000
+
+
+def scan_entrance(teleporters, direction, x, y):
+    """The pipe Game.enter_pipe used to find by checking every teleporter, as its pair id"""
+    for teleporter in teleporters:
+        if "enter" not in teleporter.name or direction not in teleporter.name:
+            continue
+        left = teleporter.shape[0][0] * SCALING
+        right = teleporter.shape[2][0] * SCALING
+        top = SCREEN_HEIGHT + teleporter.shape[0][1] * SCALING
+        bottom = SCREEN_HEIGHT + teleporter.shape[2][1] * SCALING
+        if direction == "down":
+            inside = left < x < right and y < top
+        elif direction == "up":
+            inside = left < x < right and y > bottom
+        else:
+            inside = left < x < right and bottom < y < top
+        if inside:
+            return teleporter.name[:2]
+    return None
+
+
+def scan_exit(teleporters, pair_id):
+    """Where Game.exit_pipe used to put Mario, the last matching exit wins"""
+    position = None
+    for teleporter in teleporters:
+        if "enter" not in teleporter.name and pair_id in teleporter.name:
+            position = (teleporter.shape[2][0] * SCALING, SCREEN_HEIGHT + teleporter.shape[0][1] * SCALING)
+    return position
+
+
+def find_pair(table, direction, x, y):
+    entrance = table.find_entrance(direction, x, y)
+    return None if entrance is None else entrance.pair_id
+
+
+def make_teleporter(name, left, top, right, bottom):
+    """
+    A rectangle object as arcade reads it from Tiled. Takes map pixels with
+    y down from the top, arcade's shape has y going up from there.
+    """
+    shape = [(left, -top), (right, -top), (right, -bottom), (left, -bottom)]
+    return arcade.TiledObject(shape, None, name, None)
+
+
+def get_probe_points(rng, teleporters, width):
+    points = [(rng.uniform(-100, width + 100), rng.uniform(-100, SCREEN_HEIGHT + 100))
+              for _ in range(PROBES_PER_WORLD // 2)]
+    for _ in range(PROBES_PER_WORLD // 2):
+        teleporter = rng.choice(teleporters)
+        corner_x, corner_y = rng.choice((teleporter.shape[0], teleporter.shape[2]))
+        x = corner_x * SCALING + rng.choice((-1, 0, 1, rng.uniform(-50, 50)))
+        y = SCREEN_HEIGHT + corner_y * SCALING + rng.choice((-1, 0, 1, rng.uniform(-50, 50)))
+        points.append((x, y))
+    return points
+
+
+@pytest.mark.parametrize("world", super_mario.STAGES)
+def test_table_matches_linear_scan(world):
+    tile_map = load_world(world)
+    teleporters = tile_map.object_lists[super_mario.LAYER_NAME_TELEPORT_EVENT]
+    table = TeleporterTable(teleporters, SCALING, SCREEN_HEIGHT)
+
+    rng = random.Random(world)
+    for x, y in get_probe_points(rng, teleporters, tile_map.width * super_mario.GRID_PIXEL_SIZE):
+        direction = rng.choice(DIRECTIONS)
+        assert find_pair(table, direction, x, y) == scan_entrance(teleporters, direction, x, y), (direction, x, y)
+
+    for pair_id in ("p1", "p2", "p3"):
+        assert table.get_exit(pair_id) == scan_exit(teleporters, pair_id)
+
+
+def test_pair_ids_past_nine():
+    teleporters = [
+        make_teleporter("p1enterdown", 100, 400, 140, 420),
+        make_teleporter("p1leavebottom", 1000, 400, 1040, 420),
+        make_teleporter("p10enterright", 200, 300, 240, 360),
+        make_teleporter("p10leavetop", 2000, 100, 2040, 120),
+        make_teleporter("p12enterdown", 3000, 400, 3040, 420),
+        make_teleporter("p12leavebottom", 4000, 400, 4040, 420),
+    ]
+    table = TeleporterTable(teleporters, SCALING, SCREEN_HEIGHT)
+
+    # The old lookup took the first two characters of the name, so every
+    # pair from p10 up led to p1's exit, and p1 to whichever came last
+    assert table.get_exit("p1") == (1040 * SCALING, SCREEN_HEIGHT - 400 * SCALING)
+    assert table.get_exit("p10") == (2040 * SCALING, SCREEN_HEIGHT - 100 * SCALING)
+    assert table.get_exit("p12") == (4040 * SCALING, SCREEN_HEIGHT - 400 * SCALING)
+    assert table.get_exit("p11") is None
+
+    middle_y = SCREEN_HEIGHT - 330 * SCALING
+    assert find_pair(table, "right", 220 * SCALING, middle_y) == "p10"
+    assert find_pair(table, "left", 220 * SCALING, middle_y) is None
+    assert find_pair(table, "down", 3020 * SCALING, SCREEN_HEIGHT - 400 * SCALING - 1) == "p12"
+    assert find_pair(table, "down", 120 * SCALING, SCREEN_HEIGHT - 400 * SCALING - 1) == "p1"
+
+
+def test_entrance_across_bucket_edges():
+    # Wider than a bucket and starting part way into one
+    teleporters = [make_teleporter("p1enterdown", 50, 400, 250, 420),
+                   make_teleporter("p1leavebottom", 1000, 400, 1040, 420)]
+    table = TeleporterTable(teleporters, SCALING, SCREEN_HEIGHT, bucket_width=160)
+    y = SCREEN_HEIGHT - 400 * SCALING - 1
+    for x in range(0, 300 * round(SCALING)):
+        expected = "p1" if 50 * SCALING < x < 250 * SCALING else None
+        assert find_pair(table, "down", x, y) == expected, x
+
+
+def test_unnamed_and_unknown_objects_are_ignored():
+    teleporters = [make_teleporter("spawn", 0, 0, 40, 40), make_teleporter("p3enterup", 0, 0, 40, 40)]
+    table = TeleporterTable(teleporters, SCALING, SCREEN_HEIGHT)
+    assert table.has_entrances("up")
+    assert not table.has_entrances("down")
+    assert table.get_exit("p3") is None
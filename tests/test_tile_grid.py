@@ -0,0 +1,89 @@
+import random
+
+import arcade
+import pytest
+
+import super_mario
+from conftest import load_world
+from tile_grid import TileGrid
+
+TILE = super_mario.GRID_PIXEL_SIZE
+
+GRID_LAYERS = [super_mario.LAYER_NAME_PLATFORMS_BREAKABLE, super_mario.LAYER_NAME_MYSTERY_COIN,
+               super_mario.LAYER_NAME_MYSTERY_ITEM]
+
+PROBES_PER_LAYER = 10000
+
+
+def make_grid(world, layer_name):
+    tile_map = load_world(world)
+    sprite_list = tile_map.sprite_lists[layer_name]
+    return sprite_list, TileGrid(sprite_list, TILE, tile_map.width, tile_map.height)
+
+
+def assert_same_tiles(grid, sprite_list, point):
+    expected = set(arcade.get_sprites_at_point(point, sprite_list))
+    assert set(grid.get_tiles_at_point(point)) == expected, point
+
+
+def get_probe_points(rng, tiles):
+    """Points in and around the tiles, many of them right on an edge"""
+    points = []
+    for _ in range(PROBES_PER_LAYER):
+        tile = rng.choice(tiles)
+        x = rng.choice((tile.left, tile.right, rng.uniform(tile.left - TILE, tile.right + TILE)))
+        y = rng.choice((tile.bottom, tile.top, rng.uniform(tile.bottom - TILE, tile.top + TILE)))
+        points.append((x, y))
+    return points
+
+
+@pytest.mark.parametrize("world", super_mario.STAGES)
+@pytest.mark.parametrize("layer_name", GRID_LAYERS)
+def test_grid_matches_sprite_list(world, layer_name):
+    sprite_list, grid = make_grid(world, layer_name)
+    if not len(sprite_list):
+        pytest.skip(f"no {layer_name} tiles in {world}")
+
+    rng = random.Random(f"{world} {layer_name}")
+    for point in get_probe_points(rng, list(sprite_list)):
+        assert_same_tiles(grid, sprite_list, point)
+
+
+@pytest.mark.parametrize("world", super_mario.STAGES)
+@pytest.mark.parametrize("layer_name", GRID_LAYERS)
+def test_points_on_column_edges(world, layer_name):
+    # A point on the line between two columns can be inside the tile to
+    # its left as well, which the grid has to look up too
+    sprite_list, grid = make_grid(world, layer_name)
+    for tile in sprite_list:
+        for x in (tile.left, tile.right):
+            for y in (tile.bottom, tile.center_y, tile.top):
+                assert_same_tiles(grid, sprite_list, (x, y))
+
+
+@pytest.mark.parametrize("world", super_mario.STAGES)
+def test_bumped_block_is_found_in_the_cell_above(world):
+    sprite_list, grid = make_grid(world, super_mario.LAYER_NAME_MYSTERY_ITEM)
+    if not len(sprite_list):
+        pytest.skip(f"no mystery boxes in {world}")
+
+    # A bumped block is moved up a few pixels at most (see Game.nudge_blocks),
+    # so part of it sits in the cell above the one it is indexed in
+    for tile in sprite_list:
+        tile.center_y += 6
+        try:
+            for point in ((tile.center_x, tile.top - 3), (tile.left + 3, tile.top - 3), (tile.right - 3, tile.top - 3)):
+                assert tile in grid.get_tiles_at_point(point)
+                assert_same_tiles(grid, sprite_list, point)
+            for point in ((tile.center_x, tile.top), (tile.left, tile.top - 3), (tile.right, tile.top - 3)):
+                assert_same_tiles(grid, sprite_list, point)
+        finally:
+            tile.center_y -= 6
+
+
+def test_removed_tile_is_not_found():
+    sprite_list, grid = make_grid("1-1", super_mario.LAYER_NAME_PLATFORMS_BREAKABLE)
+    tile = sprite_list[0]
+    point = tile.position
+    grid.remove(tile)
+    assert tile not in grid.get_tiles_at_point(point)
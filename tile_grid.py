@@ -0,0 +1,55 @@
+import math
+
+from arcade import is_point_in_polygon
+
+
+class TileGrid:
+    """
+    Which tile of a layer is in each cell of the level, as a 2-D array of
+    sprite references (None for an empty cell), so finding the tile at a
+    point is an index instead of a search through the layer.
+
+    Built when the level loads. Tiles taken out of the level have to be
+    removed here too.
+    """
+
+    def __init__(self, sprite_list, cell_size, columns, rows):
+        self.cell_size = cell_size
+        self.columns = columns
+        self.rows = rows
+        self.cells = [[None] * rows for _ in range(columns)]
+        for sprite in sprite_list:
+            column, row = self.get_cell(sprite.center_x, sprite.center_y)
+            if self.contains(column, row):
+                self.cells[column][row] = sprite
+
+    def get_cell(self, x, y):
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def contains(self, column, row):
+        return 0 <= column < self.columns and 0 <= row < self.rows
+
+    def remove(self, sprite):
+        column, row = self.get_cell(sprite.center_x, sprite.center_y)
+        if self.contains(column, row) and self.cells[column][row] is sprite:
+            self.cells[column][row] = None
+
+    def get_tiles_at_point(self, point):
+        """
+        The tiles whose hit box the point is in, like arcade.get_sprites_at_point.
+        The cell below is checked as well, for a block that is bumped up a
+        few pixels out of its own cell, and so is the cell to the left when
+        the point is on its edge, since edges count as inside.
+        """
+        x, y = point
+        column, row = self.get_cell(x, y)
+        columns = (column, column - 1) if x == column * self.cell_size else (column,)
+        tiles = []
+        for cell_column in columns:
+            for cell_row in (row, row - 1):
+                if not self.contains(cell_column, cell_row):
+                    continue
+                tile = self.cells[cell_column][cell_row]
+                if tile is not None and is_point_in_polygon(x, y, tile.get_adjusted_hit_box()):
+                    tiles.append(tile)
+        return tiles